@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import os
+import re
+from functools import lru_cache
 from typing import Tuple, Optional
 
 
+@lru_cache(maxsize=None)
 def _chars_per_token() -> int:
     try:
         v = int(os.environ.get("AGENT_ASYNC_CHARS_PER_TOKEN", "4"))
@@ -12,6 +15,7 @@ def _chars_per_token() -> int:
         return 4
 
 
+@lru_cache(maxsize=None)
 def _hard_cap_chars() -> int:
     try:
         # Allow very large contexts by default but keep a reasonable ceiling
@@ -20,6 +24,7 @@ def _hard_cap_chars() -> int:
         return 2_000_000
 
 
+@lru_cache(maxsize=None)
 def _default_per_message_max() -> int:
     try:
         return int(os.environ.get("AGENT_ASYNC_PER_MESSAGE_MAX_CHARS", "20000"))
@@ -27,35 +32,34 @@ def _default_per_message_max() -> int:
         return 20_000
 
 
+# Heuristic mapping, checked in order; override via env for exact control as needed
+_MODEL_PATTERNS: Tuple[Tuple[re.Pattern, int], ...] = (
+    (re.compile(r"gpt-5"), 400_000),
+    (re.compile(r"gpt-4o|gpt-4\.1|o3|o4|gpt-4"), 128_000),
+    (re.compile(r"gpt-3\.5"), 16_384),
+    (re.compile(r"claude-3\.5|claude-3-opus|claude-3-sonnet|sonnet|haiku"), 200_000),
+    (re.compile(r"gemini-1\.5"), 1_000_000),
+    (re.compile(r"deepseek|grok|xai"), 128_000),
+)
+
+
+@lru_cache(maxsize=64)
 def _guess_context_tokens(model: str) -> int:
     m = (model or "").lower()
-    # Heuristic mapping; override via env for exact control as needed
-    if not m:
-        return 128_000
-    if "gpt-5" in m:
-        return 400_000
-    if any(k in m for k in ("gpt-4o", "gpt-4.1", "o3", "o4")):
-        return 128_000
-    if "gpt-4" in m:
-        return 128_000
-    if "gpt-3.5" in m:
-        return 16_384
-    if any(k in m for k in ("claude-3.5", "claude-3-opus", "claude-3-sonnet", "sonnet")):
-        return 200_000
-    if any(k in m for k in ("haiku",)):
-        return 200_000
-    if any(k in m for k in ("gemini-1.5",)):
-        return 1_000_000
-    if any(k in m for k in ("deepseek",)):
-        return 128_000
-    if any(k in m for k in ("grok", "xai")):
-        return 128_000
+    if m:
+        for pat, tokens in _MODEL_PATTERNS:
+            if pat.search(m):
+                return tokens
     return 128_000
 
 
+@lru_cache(maxsize=32)
 def get_context_limits(model: Optional[str]) -> Tuple[int, int]:
     """Return (ctx_max_chars, per_message_max_chars) based on model.
 
+    Results are memoized per model; env overrides are read on first use.
+    Call clear_caches() after changing them at runtime.
+
     Env overrides:
     - AGENT_ASYNC_CONTEXT_MAX_CHARS: force a fixed ctx cap (chars)
     - AGENT_ASYNC_PER_MESSAGE_MAX_CHARS: force per-message cap (chars)
@@ -88,3 +92,8 @@ def get_context_limits(model: Optional[str]) -> Tuple[int, int]:
 
     return max(10_000, ctx_max), max(5_000, per_msg)
 
+
+def clear_caches() -> None:
+    """Drop memoized limits so env overrides are re-read on next call."""
+    for fn in (_chars_per_token, _hard_cap_chars, _default_per_message_max, _guess_context_tokens, get_context_limits):
+        fn.cache_clear()
@@ -1,9 +1,12 @@
 import asyncio
+import hashlib
 import json
 import re
 import time
 import os
-from typing import List, Optional, Callable, Dict, Any
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, List, Optional, Callable, Deque, Dict, Iterable, Tuple
 
 from agent_async.core.events import EventBus
 from agent_async.exec.local import LocalExecutor
@@ -11,344 +14,509 @@ from agent_async.providers.base import Message, Provider
 from agent_async.agent.context_limits import get_context_limits
 
 
+_FENCE_HEAD = re.compile(r"^```[a-zA-Z0-9_-]*\s*")
+_FENCE_TAIL = re.compile(r"\s*```$")
+_FENCE_TAG_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+_DECODER = json.JSONDecoder()
+
+try:  # optional accelerator for the whole-reply decode; stdlib is the fallback
+    import orjson
+
+    _fast_loads = orjson.loads
+except ImportError:
+    _fast_loads = json.loads
+# A line break (any str.splitlines() separator) with the whitespace around it;
+# used to fold an accidental multi-line run cmd into one "&&"-joined line
+_MULTILINE_JOIN_RE = re.compile(r"\s*[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]\s*")
+# Phrases that indicate the assistant is waiting on a human instead of acting
+_STEER_RE = re.compile(
+    "|".join(
+        re.escape(p)
+        for p in (
+            "can you provide", "please provide", "need the failing", "input for",
+            "share the", "give me", "what is the", "could you",
+        )
+    ),
+    re.IGNORECASE,
+)
+
+
+# First user turn after the task, asking for an initial inspection command
+_BOOTSTRAP_RUN_HINT = "Propose a 'run' action now to inspect the repo, e.g., git status -sb && ls -la."
+
+# Corrective user messages appended to the transcript
+_NUDGE_AFTER_TIMEOUT = (
+    "Time is limited. Reply now with exactly one JSON object that proposes a 'run' action "
+    "to gather information (e.g., run tests like 'pytest -q' or project-specific test commands), "
+    "list files, or grep for failing cases)."
+)
+_NUDGE_EMPTY_REPLY = (
+    "Your previous response was empty. Please respond with exactly one JSON object. "
+    "For example: {\"type\": \"run\", \"cmd\": \"ls -la\", \"thought\": \"List files\"}"
+)
+_HINT_INVALID_JSON = (
+    "Your previous reply was not valid JSON. Reply with exactly one JSON object only (no backticks, no prose). "
+    "Schema: {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}. "
+    "The 'cmd' must be a single-line shell command. Do not include raw newlines; use \\n escapes inside the JSON string. "
+    "If you need to write multi-line files, use a single-line printf with \\n (e.g., sh -lc 'printf %s \"line1\\nline2\" > file')."
+)
+_CORRECTION_JSON_ONLY = (
+    "Note: In future, reply with exactly one JSON object only (no extra text, no code fences). "
+    "Use the schema {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}. "
+    "The 'cmd' must be a single-line shell command; escape newlines as \\n if needed."
+)
+_HINT_MISSING_TYPE = (
+    "Your reply lacked a valid 'type'. Reply again with exactly one JSON object only, "
+    "using the schema {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}."
+)
+_HINT_STEER = (
+    "No human is available to answer. Do not ask questions. "
+    "Propose a 'run' action now to gather the needed information yourself. "
+    "For example: run tests (e.g., 'pytest -q' or project-specific test commands), "
+    "search the repo (e.g., grep -R -n test .), or inspect files."
+)
+_HINT_UNKNOWN_TYPE = (
+    "Reply again with one JSON object only using {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}."
+)
+
+
+def _strip_fences(s: str) -> str:
+    s = s.strip()
+    # Common case: the model already replied with bare JSON
+    if not (s.startswith("```") and s.endswith("```")):
+        return s
+    # Usual shape "```lang\n...\n```": slice instead of running both regexes
+    nl = s.find("\n", 3)
+    if nl != -1 and not s[3:nl].rstrip().strip(_FENCE_TAG_CHARS):
+        return s[nl + 1:-3].strip()
+    s = _FENCE_HEAD.sub("", s)
+    s = _FENCE_TAIL.sub("", s)
+    return s.strip()
+
+
+def _parse_objects(s: str) -> Tuple[list, bool]:
+    """Decode the JSON objects embedded in `s`.
+
+    Also reports whether `s` is exactly one object with nothing but
+    whitespace around it, so callers need not decode it again to check.
+    """
+    objs = []
+    first_start = 0
+    last_end = 0
+    i = 0
+    n = len(s)
+    while i < n:
+        # find next opening brace
+        j = s.find("{", i)
+        if j == -1:
+            break
+        try:
+            obj, end = _DECODER.raw_decode(s, j)
+            if not objs:
+                first_start = j
+            objs.append(obj)
+            i = last_end = end
+        except Exception:
+            i = j + 1
+    exact = len(objs) == 1 and not s[:first_start].strip() and not s[last_end:].strip()
+    return objs, exact
+
+
+def _normalize_json_string_newlines(s: str) -> str:
+    """Replace raw newlines within JSON string literals with \n to allow lenient parsing."""
+    in_string = False
+    escaped = False
+    quote = '"'
+    out = []
+    i = 0
+    n = len(s)
+    while i < n:
+        ch = s[i]
+        if in_string:
+            if escaped:
+                out.append(ch)
+                escaped = False
+            elif ch == '\\':
+                out.append(ch)
+                escaped = True
+            elif ch == quote:
+                in_string = False
+                out.append(ch)
+            elif ch == '\r':
+                # normalize CRLF or CR to \n
+                if i + 1 < n and s[i + 1] == '\n':
+                    i += 1
+                out.append('\\n')
+            elif ch == '\n':
+                out.append('\\n')
+            else:
+                out.append(ch)
+        else:
+            out.append(ch)
+            if ch == quote:
+                in_string = True
+                escaped = False
+        i += 1
+    return ''.join(out)
+
+
+_CLIP_MARKER = "\n...[truncated]...\n"
+# Chars of the newest message kept even when older context leaves no room
+_NEWEST_MIN_CHARS = 2000
+
+
+def _clip_middle(s: str, limit: int) -> str:
+    """Shorten `s` to at most `limit` chars, keeping its head and tail.
+
+    The head preserves context such as a "Command: ..." header while the
+    larger tail keeps the most recent output.
+    """
+    if len(s) <= limit:
+        return s
+    if limit <= len(_CLIP_MARKER) * 2:
+        return s[len(s) - limit:]
+    head = (limit - len(_CLIP_MARKER)) // 5
+    tail = limit - len(_CLIP_MARKER) - head
+    return s[:head] + _CLIP_MARKER + s[len(s) - tail:]
+
+
+async def _poll_cancel(cancel_check: Callable[[], bool], event: asyncio.Event, interval: float = 0.25) -> None:
+    """Set `event` once the synchronous `cancel_check` reports cancellation."""
+    while not cancel_check():
+        await asyncio.sleep(interval)
+    event.set()
+
+
+def _write_reply(fpath: Path, text: str, evict: Optional[Tuple[Path, Dict[str, Any]]] = None) -> None:
+    """Write a provider reply, creating its directory on first use.
+
+    `evict` is an older reply file to replace with a small .meta.json
+    holding its hash, size and excerpt.
+    """
+    try:
+        fpath.write_text(text)
+    except FileNotFoundError:
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text(text)
+    if evict is not None:
+        old_path, meta = evict
+        old_path.with_suffix(".meta.json").write_text(json.dumps(meta))
+        try:
+            old_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _transcript_key(model: str, messages: List[Message]) -> bytes:
+    """Content hash of a provider request, used to memoize identical calls."""
+    h = hashlib.blake2b(model.encode("utf-8", "surrogatepass"), digest_size=16)
+    for m in messages:
+        h.update(b"\x1f")
+        h.update(m.get("role", "").encode("utf-8", "surrogatepass"))
+        h.update(b"\x1e")
+        h.update(m.get("content", "").encode("utf-8", "surrogatepass"))
+    return h.digest()
+
+
+class _CachedCheck:
+    """Reuse a cancel_check result for `ttl` seconds.
+
+    The check runs at the top of every step and after every output chunk;
+    a positive result is kept for good since cancellation is not undone.
+    """
+
+    def __init__(self, fn: Callable[[], bool], ttl: float = 0.1):
+        self._fn = fn
+        self._ttl = ttl
+        self._value = False
+        self._checked_at = float("-inf")
+
+    def __call__(self) -> bool:
+        if self._value:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at >= self._ttl:
+            self._value = bool(self._fn())
+            self._checked_at = now
+        return self._value
+
+
+class _OutputBatcher:
+    """Coalesce consecutive same-stream output chunks into one proc.* event.
+
+    A batch is flushed on a stream switch, after `max_chunks` chunks or
+    `max_chars` chars, or `window` seconds after its first chunk so slow
+    output is not held back.
+    """
+
+    def __init__(self, bus: EventBus, max_chunks: int = 16, max_chars: int = 8192, window: float = 0.05):
+        self.bus = bus
+        self.max_chunks = max_chunks
+        self.max_chars = max_chars
+        self.window = window
+        self._stream: Optional[str] = None
+        self._parts: List[str] = []
+        self._chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, stream: str, text: str) -> None:
+        if self._parts and stream != self._stream:
+            self.flush()
+        if not self._parts:
+            self._stream = stream
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        self._parts.append(text)
+        self._chars += len(text)
+        if len(self._parts) >= self.max_chunks or self._chars >= self.max_chars:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts = []
+        self._chars = 0
+        self.bus.emit("proc.stdout" if self._stream == "stdout" else "proc.stderr", {"text": text})
+
+
 class AgentRunner:
     def __init__(self, event_bus: EventBus, provider: Provider, executor: LocalExecutor, truncate_limit: Optional[int] = None, cancel_check: Optional[Callable[[], bool]] = None):
         self.bus = event_bus
         self.provider = provider
         self.executor = executor
         self.truncate_limit = truncate_limit
-        self.cancel_check = cancel_check
+        self.cancel_check = _CachedCheck(cancel_check) if cancel_check else None
+        # cancel() may be called from another thread; it flags the request and
+        # wakes the running loop through _cancel_event (created in run())
+        self._cancel_requested = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cancel_event: Optional[asyncio.Event] = None
+        # Long-lived tasks provider calls wait on to wake on cancellation
+        self._cancel_tasks: List["asyncio.Task[None]"] = []
         self.is_summarizing = False
+        # Running _estimate_len of the live transcript, kept in step by _push
+        # and the in-place helpers so the context check need not rescan it
+        self._transcript_chars = 0
+        # Transcript length after the last summarization attempt; another is
+        # only tried once the transcript has grown 20% past it
+        self._last_summary_chars = 0
+        # Step events queued by _emit; written together before each await
+        self._pending_events: List[Tuple[str, Dict[str, Any]]] = []
+        # Messages are replaced rather than mutated, so one system message
+        # dict can seed every run of this runner
+        self._system_msg: Message = {"role": "system", "content": provider.system_prompt}
+        # Opt-in memo of provider replies for byte-identical transcripts
+        self._reply_cache: Optional["OrderedDict[bytes, str]"] = (
+            OrderedDict() if os.environ.get("AGENT_ASYNC_REPLY_CACHE") in ("1", "true", "yes") else None
+        )
+        # Env tunables, read once per runner rather than per run/step
+        # (limits to avoid giving up too early on format issues)
+        self._invalid_limit = int(os.environ.get("AGENT_ASYNC_INVALID_JSON_RETRIES", "3"))
+        self._no_text_limit = int(os.environ.get("AGENT_ASYNC_NO_TEXT_RESETS", "2"))
+        self._think_timeout = int(os.environ.get("AGENT_ASYNC_THINK_TIMEOUT", "600"))
+        # Optional soft cap on transcript length in messages (0 disables)
+        self._max_messages = int(os.environ.get("AGENT_ASYNC_MAX_MESSAGES", "0"))
+        self._json_leniency = os.environ.get("AGENT_ASYNC_DISABLE_JSON_LENIENCY") not in ("1", "true", "yes")
+        # Raw provider replies go next to the run's event log; the directory
+        # is created by _write_reply on first use
+        bus_path = getattr(event_bus, "path", None)
+        self._replies_dir: Optional[Path] = Path(bus_path).parent / "provider_replies" if bus_path else None
+        # Opt-in: keep only the newest N full replies on disk (0 keeps all)
+        try:
+            self._keep_replies = int(os.environ.get("AGENT_ASYNC_KEEP_REPLIES", "0"))
+        except ValueError:
+            self._keep_replies = 0
+        self._reply_ring: Deque[Tuple[Path, Dict[str, Any]]] = deque()
 
     async def run(self, run_id: str, task: str, model: Optional[str]) -> None:
-        original_transcript: List[Message] = [
-            {"role": "system", "content": self.provider.system_prompt},
-            {"role": "user", "content": f"Task: {task}"},
+        try:
+            await self._run_steps(task, model)
+        finally:
+            for t in self._cancel_tasks:
+                t.cancel()
+            self._cancel_tasks = []
+            self._flush_events()
+
+    async def _run_steps(self, task: str, model: Optional[str]) -> None:
+        original_transcript: Tuple[Message, Message] = (
+            self._system_msg,
+            {"role": "user", "content": "Task: " + task},
+        )
+        transcript: List[Message] = [
+            *original_transcript,
+            # Bootstrap: nudge model to propose a first 'run' action to inspect the repo
+            {"role": "user", "content": _BOOTSTRAP_RUN_HINT},
         ]
-        transcript: List[Message] = list(original_transcript)
-        # Bootstrap: nudge model to propose a first 'run' action to inspect the repo
-        transcript.append({
-            "role": "user",
-            "content": (
-                "Propose a 'run' action now to inspect the repo, e.g., git status -sb && ls -la."
-            ),
-        })
 
         max_steps = 50
         invalid_count = 0
         invalid_action_count = 0
         consecutive_message_only = 0
         no_text_resets = 0
-        # Tunables to avoid giving up too early on format issues
-        invalid_limit = int(os.environ.get("AGENT_ASYNC_INVALID_JSON_RETRIES", "3"))
-        no_text_limit = int(os.environ.get("AGENT_ASYNC_NO_TEXT_RESETS", "2"))
-        think_timeout = int(os.environ.get("AGENT_ASYNC_THINK_TIMEOUT", "600"))
+        invalid_limit = self._invalid_limit
+        no_text_limit = self._no_text_limit
+        think_timeout = self._think_timeout
+        max_messages = self._max_messages
+        if max_messages:
+            max_messages = max(max_messages, len(original_transcript) + 1)
+        prov_name = getattr(self.provider, "name", "")
+        model_s = model or ""
+        # Memoized per model, so one lookup serves every step of the run
+        ctx_max, per_msg_max = get_context_limits(model)
+        self._transcript_chars = self._estimate_len(transcript)
+        self._last_summary_chars = 0
+        self._loop = asyncio.get_running_loop()
+        self._cancel_event = cancel_event = asyncio.Event()
+        if self._cancel_requested:
+            cancel_event.set()
+        # Provider calls wake on cancellation through these, created once per
+        # run: cancel() sets the event directly, and a background poller
+        # bridges a polled cancel_check into the same event.
+        self._cancel_tasks = [asyncio.create_task(cancel_event.wait())]
+        poller = None
+        if self.cancel_check:
+            poller = asyncio.create_task(_poll_cancel(self.cancel_check, cancel_event))
+            self._cancel_tasks.append(poller)
         for step in range(max_steps):
             # Check for cancellation
-            if self.cancel_check and self.cancel_check():
-                self.bus.emit("agent.message", {"role": "info", "content": "Run cancelled by user."})
-                self.bus.emit("agent.done", {})
+            if self._cancelled():
+                self._emit_many((
+                    ("agent.message", {"role": "info", "content": "Run cancelled by user."}),
+                    ("agent.done", {}),
+                ))
                 break
+            # Drop the oldest turns past the seed messages, in place, so the
+            # history never grows beyond the cap between summarizations
+            if max_messages and len(transcript) > max_messages:
+                seed = len(original_transcript)
+                cut = seed + len(transcript) - max_messages
+                self._transcript_chars -= self._estimate_len(transcript[seed:cut])
+                del transcript[seed:cut]
             try:
                 # --- Context Management: Summarization and Truncation ---
-                ctx_max, per_msg_max = get_context_limits(model)
-
                 # 1. Summarize if the transcript is too long
-                if self._estimate_len(transcript) > ctx_max:
-                    await self._summarize_transcript_inplace(transcript, model)
+                if self._transcript_chars > ctx_max and self._transcript_chars > self._last_summary_chars * 1.2:
+                    self._flush_events()
+                    await self._summarize_transcript_inplace(transcript, model, ctx_max)
 
                 # 2. Prepare a trimmed view of the transcript for the provider
-                trimmed: List[Message] = []
-                # Always keep the first system message
-                if transcript and transcript[0].get("role") == "system":
-                    trimmed.append({"role": "system", "content": transcript[0].get("content", "")})
-                    rest = transcript[1:]
-                else:
-                    rest = transcript[:]
-
-                # Truncate overly long message contents first
-                normalized: List[Message] = []
-                for m in rest:
-                    c = m.get("content", "")
-                    if per_msg_max > 0 and len(c) > per_msg_max:
-                        c = c[-per_msg_max:]
-                    normalized.append({"role": m.get("role", "user"), "content": c})
-
-                # Add from the end until within ctx_max
-                acc: List[Message] = []
-                for m in reversed(normalized):
-                    acc.append(m)
-                    candidate = trimmed + list(reversed(acc))
-                    if self._estimate_len(candidate) > ctx_max:
-                        acc.pop()  # remove last that overflowed
-                        break
-                send_transcript: List[Message] = trimmed + list(reversed(acc))
+                send_transcript, was_trimmed = self._render_transcript(transcript, ctx_max, per_msg_max)
 
-                if self._estimate_len(send_transcript) < self._estimate_len(transcript):
-                    self.bus.emit("agent.message", {"role": "info", "content": "Context trimmed to fit model limits."})
+                if was_trimmed:
+                    self._emit("agent.message", {"role": "info", "content": "Context trimmed to fit model limits."})
 
                 # --- Provider Interaction ---
-                prov_name = getattr(self.provider, "name", "")
-                self.bus.emit("provider.start", {"provider": prov_name, "model": model or "", "messages": len(send_transcript)})
-                # Emit a lightweight heartbeat so users see we're waiting on the model
-                self.bus.emit("agent.message", {"role": "info", "content": "Thinking with provider..."})
-                # Run provider completion with cooperative cancellation polling
-                started = time.time()
-                task = asyncio.create_task(self.provider.complete(model or "", send_transcript))
-                reply = None
-                while True:
-                    if self.cancel_check and self.cancel_check():
-                        task.cancel()
-                        dur = int((time.time() - started) * 1000)
-                        self.bus.emit("provider.end", {"ok": False, "provider": prov_name, "model": model or "", "duration_ms": dur, "cancelled": True})
-                        self.bus.emit("agent.message", {"role": "info", "content": "Cancelled while waiting for provider."})
-                        self.bus.emit("agent.done", {})
+                self._emit("provider.start", {"provider": prov_name, "model": model_s, "messages": len(send_transcript)})
+                # Emit a lightweight heartbeat so users see we're waiting on the model,
+                # but only once the call is actually slow enough to notice
+                heartbeat = asyncio.get_running_loop().call_later(
+                    0.5, self.bus.emit, "agent.message", {"role": "info", "content": "Thinking with provider..."}
+                )
+                # Run provider completion and wake only on reply, cancel, or think timeout
+                started = time.monotonic()
+                prov_task = asyncio.create_task(self._complete(model_s, send_transcript))
+                self._flush_events()
+                try:
+                    done, _ = await asyncio.wait(
+                        {prov_task, *self._cancel_tasks}, timeout=think_timeout or None, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    heartbeat.cancel()
+                if prov_task not in done:
+                    prov_task.cancel()
+                    if poller in done:
+                        poller.result()  # surface errors raised by cancel_check
+                    if cancel_event.is_set():
+                        dur = int((time.monotonic() - started) * 1000)
+                        self._emit_many((
+                            ("provider.end", {"ok": False, "provider": prov_name, "model": model_s, "duration_ms": dur, "cancelled": True}),
+                            ("agent.message", {"role": "info", "content": "Cancelled while waiting for provider."}),
+                            ("agent.done", {}),
+                        ))
                         return
                     # Enforce an absolute think timeout
-                    if think_timeout and (time.time() - started) >= think_timeout:
-                        try:
-                            task.cancel()
-                        except Exception:
-                            pass
-                        raise asyncio.TimeoutError(f"provider think timeout after {think_timeout}s")
-                    try:
-                        # Shield the task so wait_for timeouts do not cancel it
-                        reply = await asyncio.wait_for(asyncio.shield(task), timeout=0.5)
-                        break
-                    except asyncio.TimeoutError:
-                        # keep polling
-                        continue
-                dur = int((time.time() - started) * 1000)
-                self.bus.emit("provider.end", {"ok": True, "provider": prov_name, "model": model or "", "duration_ms": dur, "chars": len(reply or "")})
+                    raise asyncio.TimeoutError(f"provider think timeout after {think_timeout}s")
+                reply = prov_task.result()
+                dur = int((time.monotonic() - started) * 1000)
+                self._emit("provider.end", {"ok": True, "provider": prov_name, "model": model_s, "duration_ms": dur, "chars": len(reply or "")})
                 # Persist raw provider reply to a per-run file and emit a reference event
-                try:
-                    from pathlib import Path
-                    run_dir = Path(self.bus.path).parent
-                    out_dir = run_dir / "provider_replies"
-                    out_dir.mkdir(parents=True, exist_ok=True)
-                    fname = f"step_{step:03}.txt"
-                    fpath = out_dir / fname
-                    fpath.write_text(reply if isinstance(reply, str) else str(reply))
-                    excerpt = (reply or "")[:400] if isinstance(reply, str) else str(reply)[:400]
-                    self.bus.emit("provider.reply", {"file": str(fpath.relative_to(run_dir)), "bytes": len((reply or "")), "excerpt": excerpt})
-                except Exception:
-                    pass
+                if self._replies_dir is not None:
+                    try:
+                        fname = f"step_{step:03}.txt"
+                        fpath = self._replies_dir / fname
+                        text = reply if isinstance(reply, str) else str(reply)
+                        excerpt = (reply or "")[:400] if isinstance(reply, str) else text[:400]
+                        entry = evict = None
+                        if self._keep_replies > 0:
+                            digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+                            entry = (fpath, {"sha256": digest, "bytes": len(text), "excerpt": excerpt})
+                            if len(self._reply_ring) >= self._keep_replies:
+                                evict = self._reply_ring[0]
+                        # Write off the event loop so large replies do not stall it
+                        self._flush_events()
+                        await asyncio.to_thread(_write_reply, fpath, text, evict)
+                        # Update the ring only once the write succeeded, so a
+                        # failed step does not lose track of an older file
+                        if evict is not None:
+                            self._reply_ring.popleft()
+                        if entry is not None:
+                            self._reply_ring.append(entry)
+                        self._emit("provider.reply", {"file": os.path.join("provider_replies", fname), "bytes": len((reply or "")), "excerpt": excerpt})
+                    except Exception:
+                        pass
             except asyncio.CancelledError:
                 # Gracefully handle cancellation, don't crash the worker thread
-                try:
-                    prov_name = getattr(self.provider, "name", "")
-                except Exception:
-                    prov_name = ""
-                self.bus.emit("provider.end", {"ok": False, "provider": prov_name, "model": model or "", "cancelled": True})
-                self.bus.emit("agent.message", {"role": "info", "content": "Cancelled."})
-                self.bus.emit("agent.done", {})
+                self._emit_many((
+                    ("provider.end", {"ok": False, "provider": prov_name, "model": model_s, "cancelled": True}),
+                    ("agent.message", {"role": "info", "content": "Cancelled."}),
+                    ("agent.done", {}),
+                ))
                 return
             except Exception as e:
-                emsg = str(e).lower()
+                err = str(e)
                 # best-effort provider.end on error
                 try:
-                    prov_name = getattr(self.provider, "name", "")
-                    self.bus.emit("provider.end", {"ok": False, "provider": prov_name, "model": model or "", "error": str(e)})
+                    self._emit("provider.end", {"ok": False, "provider": prov_name, "model": model_s, "error": err})
                 except Exception:
                     pass
-                if isinstance(e, asyncio.TimeoutError) or "timeout" in emsg:
-                    self.bus.emit(
+                # Only non-timeout errors need their text classified
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                emsg = "" if timed_out else err.lower()
+                if timed_out or "timeout" in emsg:
+                    self._emit(
                         "agent.message",
                         {"role": "info", "content": "Provider timed out. Nudging model to act with a JSON 'run' action."},
                     )
-                    transcript.append({
-                        "role": "user",
-                        "content": (
-                            "Time is limited. Reply now with exactly one JSON object that proposes a 'run' action "
-                            "to gather information (e.g., run tests like 'pytest -q' or project-specific test commands), "
-                            "list files, or grep for failing cases)."
-                        ),
-                    })
+                    self._push(transcript, "user", _NUDGE_AFTER_TIMEOUT)
                     continue
                 if "no text in response" in emsg or "empty response" in emsg:
                     if no_text_resets < no_text_limit:
                         no_text_resets += 1
-                        self.bus.emit(
+                        self._emit(
                             "agent.message",
                             {"role": "info", "content": f"Provider returned no text (attempt {no_text_resets}/{no_text_limit}); nudging model to respond with a JSON 'run' action."},
                         )
                         # Nudge model to respond with a JSON 'run' action
-                        transcript.append({
-                            "role": "user",
-                            "content": (
-                                "Your previous response was empty. Please respond with exactly one JSON object. "
-                                "For example: {\"type\": \"run\", \"cmd\": \"ls -la\", \"thought\": \"List files\"}"
-                            ),
-                        })
+                        self._push(transcript, "user", _NUDGE_EMPTY_REPLY)
                         continue
                 # Other errors: surface and stop
-                self.bus.emit("agent.error", {"error": str(e)})
+                self._emit("agent.error", {"error": err})
                 break
 
             # Try to robustly parse a single JSON action from the reply.
-            def strip_fences(s: str) -> str:
-                s = s.strip()
-                if s.startswith("```") and s.endswith("```"):
-                    s = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", s)
-                    s = re.sub(r"\s*```$", "", s)
-                return s.strip()
-
-            def parse_objects(s: str):
-                objs = []
-                dec = json.JSONDecoder()
-                i = 0
-                n = len(s)
-                while i < n:
-                    # find next opening brace
-                    j = s.find("{", i)
-                    if j == -1:
-                        break
-                    try:
-                        obj, end = dec.raw_decode(s, j)
-                        objs.append(obj)
-                        i = end
-                    except Exception:
-                        i = j + 1
-                return objs
-
-            def normalize_json_string_newlines(s: str) -> str:
-                """Replace raw newlines within JSON string literals with \n to allow lenient parsing."""
-                in_string = False
-                escaped = False
-                quote = '"'
-                out = []
-                i = 0
-                n = len(s)
-                while i < n:
-                    ch = s[i]
-                    if in_string:
-                        if escaped:
-                            out.append(ch)
-                            escaped = False
-                        elif ch == '\\':
-                            out.append(ch)
-                            escaped = True
-                        elif ch == quote:
-                            in_string = False
-                            out.append(ch)
-                        elif ch == '\r':
-                            # normalize CRLF or CR to \n
-                            if i + 1 < n and s[i + 1] == '\n':
-                                i += 1
-                            out.append('\\n')
-                        elif ch == '\n':
-                            out.append('\\n')
-                        else:
-                            out.append(ch)
-                    else:
-                        out.append(ch)
-                        if ch == quote:
-                            in_string = True
-                            escaped = False
-                    i += 1
-                return ''.join(out)
-
-            cleaned = strip_fences(reply)
-            objs = parse_objects(cleaned)
-            normalized_applied = False
-            if not objs:
-                # NEW: Attempt to repair broken quotes in 'cmd' field as a first-pass repair
-                try:
-                    cmd_start_str = '"cmd": "'
-                    cmd_start_idx = cleaned.find(cmd_start_str)
-                    thought_start_str = '", "thought": "'
-                    thought_start_idx = cleaned.rfind(thought_start_str)
-
-                    if cmd_start_idx != -1 and thought_start_idx != -1 and cmd_start_idx < thought_start_idx:
-                        prefix_end = cmd_start_idx + len(cmd_start_str)
-                        middle = cleaned[prefix_end:thought_start_idx]
-                        
-                        if '"' in middle: # Only repair if there are quotes to fix
-                            prefix = cleaned[:prefix_end]
-                            suffix = cleaned[thought_start_idx:]
-                            repaired_middle = middle.replace('"', '\\"')
-                            repaired_cleaned = prefix + repaired_middle + suffix
-                            
-                            temp_objs = parse_objects(repaired_cleaned)
-                            if temp_objs:
-                                self.bus.emit("agent.message", {"role": "info", "content": "Repaired unescaped quotes in 'cmd' field."})
-                                cleaned = repaired_cleaned
-                                objs = temp_objs
-                except Exception:
-                    pass # Ignore repair errors, fall through to next method
-
-            if not objs:
-                # Try a lenient normalization to convert raw newlines inside strings to \n
-                if os.environ.get("AGENT_ASYNC_DISABLE_JSON_LENIENCY") not in ("1", "true", "yes"): 
-                    cleaned_norm = normalize_json_string_newlines(cleaned)
-                    if cleaned_norm != cleaned:
-                        objs = parse_objects(cleaned_norm)
-                        if objs:
-                            normalized_applied = True
-                            cleaned = cleaned_norm
-
-            # Detect non-compliant formatting: multiple objects or extra text around JSON
-            non_compliant = False
-            try:
-                dec = json.JSONDecoder()
-                s = cleaned.lstrip()
-                if s:
-                    _, end = dec.raw_decode(s)
-                    rest = s[end:].strip()
-                    if rest:
-                        non_compliant = True
-                if len(objs) > 1:
-                    non_compliant = True
-            except Exception:
-                # If we still can't decode from the start, mark as non-compliant to nudge the model
-                non_compliant = True
-
-            action = None
-            if objs:
-                # Use the first object as the action; merge 'thought' from the next if present
-                action = objs[0]
-                if "thought" not in action:
-                    for extra in objs[1:]:
-                        if isinstance(extra, dict) and extra.get("thought"):
-                            action["thought"] = extra.get("thought")
-                            break
-            else:
-                # last resort: try to load substring between first { and last }
-                try:
-                    start = cleaned.index("{")
-                    end = cleaned.rindex("}") + 1
-                    try:
-                        action = json.loads(cleaned[start:end])
-                    except Exception:
-                        # Try normalization on just the JSON slice
-                        inner = cleaned[start:end]
-                        inner_norm = normalize_json_string_newlines(inner)
-                        if inner_norm != inner:
-                            action = json.loads(inner_norm)
-                            normalized_applied = True
-                            # treat as non-compliant since we had to slice
-                            non_compliant = True
-                except Exception:
-                    pass
-
-            if normalized_applied:
-                self.bus.emit("agent.message", {"role": "info", "content": "Applied lenient JSON newline normalization (converted raw newlines in strings to \\n)."})
+            action, cleaned, non_compliant = self._parse_action(reply)
 
             if action is None:
                 invalid_count += 1
-                self.bus.emit("agent.error", {"error": f"Invalid provider reply (not JSON): {reply[:200]}"})
-                # Provide explicit guidance to help the model correct formatting
-                hint = (
-                    "Your previous reply was not valid JSON. Reply with exactly one JSON object only (no backticks, no prose). "
-                    "Schema: {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}. "
-                    "The 'cmd' must be a single-line shell command. Do not include raw newlines; use \\n escapes inside the JSON string. "
-                    "If you need to write multi-line files, use a single-line printf with \\n (e.g., sh -lc 'printf %s \"line1\\nline2\" > file')."
-                )
-                self.bus.emit("agent.message", {"role": "info", "content": "Requesting JSON-only corrected reply (single-line cmd)."})
+                self._emit("agent.error", {"error": f"Invalid provider reply (not JSON): {reply[:200]}"})
+                self._emit("agent.message", {"role": "info", "content": "Requesting JSON-only corrected reply (single-line cmd)."})
                 if invalid_count >= invalid_limit:
                     break
-                # Ask the model to reformat strictly as JSON
-                transcript.append({"role": "user", "content": hint})
+                # Ask the model to reformat strictly as JSON, with explicit guidance
+                self._push(transcript, "user", _HINT_INVALID_JSON)
                 continue
 
             invalid_count = 0
@@ -356,57 +524,47 @@ class AgentRunner:
             # If the reply contained extra text or multiple objects, request strict JSON-only in next turn
             if non_compliant:
                 # Proceed with the parsed action, but warn and nudge the model to be JSON-only next time
-                self.bus.emit("agent.message", {"role": "info", "content": "Model returned extra text; proceeding with parsed JSON and requesting JSON-only next time."})
-                correction = (
-                    "Note: In future, reply with exactly one JSON object only (no extra text, no code fences). "
-                    "Use the schema {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}. "
-                    "The 'cmd' must be a single-line shell command; escape newlines as \\n if needed."
-                )
+                self._emit("agent.message", {"role": "info", "content": "Model returned extra text; proceeding with parsed JSON and requesting JSON-only next time."})
                 # Append hint for the next turn without blocking current action
-                transcript.append({"role": "user", "content": correction})
+                self._push(transcript, "user", _CORRECTION_JSON_ONLY)
                 # Do not continue; we will execute the parsed action below
 
-            atype = action.get("type")
-            if not isinstance(atype, str):
-                atype = None
+            # Read each action field once
+            raw_type = action.get("type")
+            cmd = action.get("cmd")
+            msg = action.get("message")
             thought = action.get("thought")
+            atype = raw_type if isinstance(raw_type, str) else None
             if thought:
-                self.bus.emit("agent.message", {"role": "thought", "content": thought})
+                self._emit("agent.message", {"role": "thought", "content": thought})
 
             # Handle missing/unknown type by inference or by requesting correction
             if atype not in ("run", "message", "done"):
                 # Log raw reply excerpt for debugging
                 try:
                     raw_excerpt = cleaned[:500]
-                    self.bus.emit("agent.message", {"role": "info", "content": f"Provider reply missing/unknown type; inferring action. Excerpt: {raw_excerpt}"})
+                    self._emit("agent.message", {"role": "info", "content": f"Provider reply missing/unknown type; inferring action. Excerpt: {raw_excerpt}"})
                 except Exception:
                     pass
                 # Infer a reasonable default
-                if isinstance(action.get("cmd"), str) and action.get("cmd").strip():
+                if isinstance(cmd, str) and cmd.strip():
                     atype = "run"
-                    self.bus.emit("agent.message", {"role": "info", "content": "Inferred action type 'run' from 'cmd' field."})
-                elif isinstance(action.get("message"), str) and action.get("message").strip():
+                    self._emit("agent.message", {"role": "info", "content": "Inferred action type 'run' from 'cmd' field."})
+                elif isinstance(msg, str) and msg.strip():
                     atype = "message"
-                    self.bus.emit("agent.message", {"role": "info", "content": "Inferred action type 'message' from 'message' field."})
+                    self._emit("agent.message", {"role": "info", "content": "Inferred action type 'message' from 'message' field."})
                 else:
                     invalid_action_count += 1
-                    self.bus.emit("agent.error", {"error": f"Unknown action type: {action.get('type')}"})
+                    self._emit("agent.error", {"error": f"Unknown action type: {raw_type}"})
                     if invalid_action_count >= 3:
                         break
                     # Ask the model to resend with a proper 'type'
-                    transcript.append({
-                        "role": "user",
-                        "content": (
-                            "Your reply lacked a valid 'type'. Reply again with exactly one JSON object only, "
-                            "using the schema {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}."
-                        ),
-                    })
+                    self._push(transcript, "user", _HINT_MISSING_TYPE)
                     continue
 
             if atype == "run":
-                cmd = action.get("cmd")
                 if not cmd:
-                    self.bus.emit("agent.error", {"error": "Missing cmd in run action"})
+                    self._emit("agent.error", {"error": "Missing cmd in run action"})
                     break
                 # Guard against multi-line commands by auto-correcting to a single line,
                 # but allow intentional multi-line scripts and JSON strings.
@@ -429,31 +587,55 @@ class AgentRunner:
                     )
                     
                     if not is_intentional_multiline:
-                        self.bus.emit("agent.message", {"role": "info", "content": "Run cmd contained raw newlines; auto-correcting to a single-line command."})
-                        lines = [line.strip() for line in cmd.splitlines() if line.strip()]
-                        cmd = " && ".join(lines)
+                        self._emit("agent.message", {"role": "info", "content": "Run cmd contained raw newlines; auto-correcting to a single-line command."})
+                        cmd = _MULTILINE_JOIN_RE.sub(" && ", cmd.strip())
                 consecutive_message_only = 0
-                self.bus.emit("agent.command", {"cmd": cmd})
+                self._emit("agent.command", {"cmd": cmd})
                 # Execute and stream output
-                chunks: list[str] = []
-                async for stream, text in self.executor.run(cmd, cancel_check=self.cancel_check):
-                    if stream == "stdout":
-                        self.bus.emit("proc.stdout", {"text": text})
-                    else:
-                        self.bus.emit("proc.stderr", {"text": text})
-                    chunks.append(text)
-
-                full_output = "".join(chunks)
                 # Feed back the last N lines of output to the model for the current command
                 # Policy: last 5 commands -> 200 lines, older commands -> 5 lines
                 tail_lines = 200
+                # Optional per-run cap on output chars sent to the model
+                char_limit = self.truncate_limit if self.truncate_limit and self.truncate_limit > 0 else 0
+                # Only retain the chunks that can still contribute to the last
+                # `tail_lines` lines (and `char_limit` chars), so memory stays
+                # bounded for huge outputs
+                tail: Deque[Tuple[str, int]] = deque()
+                tail_newlines = 0
+                tail_chars = 0
+                total_chars = 0
+                batcher = _OutputBatcher(self.bus)
+                self._flush_events()
+                try:
+                    async for stream, text in self.executor.run(cmd, cancel_check=self._cancelled):
+                        batcher.add(stream, text)
+                        n = text.count("\n")
+                        tail.append((text, n))
+                        tail_newlines += n
+                        tail_chars += len(text)
+                        total_chars += len(text)
+                        while len(tail) > 1 and (
+                            tail_newlines - tail[0][1] > tail_lines
+                            or (char_limit and tail_chars - len(tail[0][0]) >= char_limit)
+                        ):
+                            dropped, k = tail.popleft()
+                            tail_newlines -= k
+                            tail_chars -= len(dropped)
+                finally:
+                    batcher.flush()
+
+                full_output = "".join(t for t, _ in tail)
+                header = f"Output (last {tail_lines} lines):"
+                if char_limit and len(full_output) > char_limit:
+                    full_output = full_output[-char_limit:]
+                    header = f"Output (last {tail_lines} lines, truncated to last {char_limit} of {total_chars} chars):"
                 lines = full_output.splitlines()
                 excerpt_lines = lines[-tail_lines:] if tail_lines > 0 else []
-                excerpt_text = "\n".join(excerpt_lines)
-                transcript.append({
-                    "role": "user",
-                    "content": f"Command: {cmd}\nOutput (last {tail_lines} lines):\n{excerpt_text}",
-                })
+                # Join header and excerpt once instead of joining the excerpt and
+                # then copying it again into an f-string
+                parts = [f"Command: {cmd}", header]
+                parts.extend(excerpt_lines or ("",))
+                self._push(transcript, "user", "\n".join(parts))
 
                 # After appending current output, compress outputs of commands older than the last 5 to 5 lines
                 try:
@@ -464,58 +646,246 @@ class AgentRunner:
                 continue
 
             if atype == "message":
-                msg = action.get("message") or ""
-                self.bus.emit("agent.message", {"role": "assistant", "content": msg})
-                transcript.append({"role": "assistant", "content": msg})
+                msg = msg or ""
+                self._emit("agent.message", {"role": "assistant", "content": msg})
+                self._push(transcript, "assistant", msg)
                 consecutive_message_only += 1
                 # If the assistant keeps asking the user, steer it to act.
-                steer_patterns = [
-                    "can you provide", "please provide", "need the failing", "input for",
-                    "share the", "give me", "what is the", "could you",
-                ]
-                lower = msg.lower()
-                if any(p in lower for p in steer_patterns) or consecutive_message_only >= 2:
-                    hint = (
-                        "No human is available to answer. Do not ask questions. "
-                        "Propose a 'run' action now to gather the needed information yourself. "
-                        "For example: run tests (e.g., 'pytest -q' or project-specific test commands), "
-                        "search the repo (e.g., grep -R -n test .), or inspect files."
-                    )
-                    self.bus.emit("agent.message", {"role": "info", "content": "Steering model to act without user input."})
-                    transcript.append({"role": "user", "content": hint})
+                # The streak check comes first so long messages are only
+                # scanned when it does not already apply.
+                if consecutive_message_only >= 2 or _STEER_RE.search(msg) is not None:
+                    self._emit("agent.message", {"role": "info", "content": "Steering model to act without user input."})
+                    self._push(transcript, "user", _HINT_STEER)
                 # Prevent infinite loops of messages
                 if consecutive_message_only >= 6:
-                    self.bus.emit("agent.error", {"error": "Too many assistant messages without actions."})
+                    self._emit("agent.error", {"error": "Too many assistant messages without actions."})
                     break
                 continue
 
             if atype == "done":
                 # If a message is provided alongside done, show it
-                msg = action.get("message")
                 if isinstance(msg, str) and msg.strip():
-                    self.bus.emit("agent.message", {"role": "assistant", "content": msg})
-                    transcript.append({"role": "assistant", "content": msg})
-                self.bus.emit("agent.done", {})
+                    self._emit("agent.message", {"role": "assistant", "content": msg})
+                    self._push(transcript, "assistant", msg)
+                self._emit("agent.done", {})
                 break
 
             # Unknown action type (fallback)
-            self.bus.emit("agent.error", {"error": f"Unknown action type: {atype}"})
+            self._emit("agent.error", {"error": f"Unknown action type: {atype}"})
             invalid_action_count += 1
             if invalid_action_count >= 3:
                 break
-            transcript.append({
-                "role": "user",
-                "content": (
-                    "Reply again with one JSON object only using {\"type\":\"run|message|done\",\"cmd?\":string,\"message?\":string,\"thought\":string}."
-                ),
-            })
+            self._push(transcript, "user", _HINT_UNKNOWN_TYPE)
             continue
 
+    def cancel(self) -> None:
+        """Request cancellation of the current run; safe to call from any thread."""
+        self._cancel_requested = True
+        loop, event = self._loop, self._cancel_event
+        if loop is not None and event is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # the run's loop has already closed
+
+    def _cancelled(self) -> bool:
+        if self._cancel_requested:
+            return True
+        return bool(self.cancel_check and self.cancel_check())
+
+    def _parse_action(self, reply: str) -> Tuple[Optional[dict], str, bool]:
+        """Extract the JSON action from a provider reply.
+
+        Returns the action (or None), the cleaned reply text it was parsed
+        from, and whether the reply strayed from "exactly one JSON object".
+        """
+        cleaned = _strip_fences(reply)
+        normalized_applied = False
+        non_compliant = False
+        # Fast path: the whole reply is exactly one JSON object, so a single
+        # decode yields the action and proves compliance at once.
+        try:
+            first = _fast_loads(cleaned)
+        except ValueError:
+            first = None
+        if isinstance(first, dict):
+            objs = [first]
+        else:
+            objs, exact = _parse_objects(cleaned)
+            if not objs:
+                # NEW: Attempt to repair broken quotes in 'cmd' field as a first-pass repair
+                try:
+                    cmd_start_str = '"cmd": "'
+                    cmd_start_idx = cleaned.find(cmd_start_str)
+                    thought_start_str = '", "thought": "'
+                    thought_start_idx = cleaned.rfind(thought_start_str)
+
+                    if cmd_start_idx != -1 and thought_start_idx != -1 and cmd_start_idx < thought_start_idx:
+                        prefix_end = cmd_start_idx + len(cmd_start_str)
+                        middle = cleaned[prefix_end:thought_start_idx]
+                    
+                        if '"' in middle: # Only repair if there are quotes to fix
+                            prefix = cleaned[:prefix_end]
+                            suffix = cleaned[thought_start_idx:]
+                            repaired_middle = middle.replace('"', '\\"')
+                            repaired_cleaned = prefix + repaired_middle + suffix
+                        
+                            temp_objs, temp_exact = _parse_objects(repaired_cleaned)
+                            if temp_objs:
+                                self._emit("agent.message", {"role": "info", "content": "Repaired unescaped quotes in 'cmd' field."})
+                                cleaned = repaired_cleaned
+                                objs, exact = temp_objs, temp_exact
+                except Exception:
+                    pass # Ignore repair errors, fall through to next method
+
+            if not objs:
+                # Try a lenient normalization to convert raw newlines inside strings to \n
+                if self._json_leniency:
+                    cleaned_norm = _normalize_json_string_newlines(cleaned)
+                    if cleaned_norm != cleaned:
+                        objs, exact = _parse_objects(cleaned_norm)
+                        if objs:
+                            normalized_applied = True
+                            cleaned = cleaned_norm
+
+            # Non-compliant formatting: multiple objects or extra text around JSON
+            non_compliant = not exact
+
+        action = None
+        if objs:
+            # Use the first object as the action; merge 'thought' from the next if present
+            action = objs[0]
+            if "thought" not in action:
+                for extra in objs[1:]:
+                    if isinstance(extra, dict) and extra.get("thought"):
+                        action["thought"] = extra.get("thought")
+                        break
+        else:
+            # last resort: normalize just the substring between first { and last }.
+            # The raw slice itself is not decoded again: _parse_objects already
+            # tried raw_decode at the first "{", which covers that exact text.
+            start = cleaned.find("{")
+            end = cleaned.rfind("}") + 1
+            if start != -1 and end > start:
+                inner = cleaned[start:end]
+                inner_norm = _normalize_json_string_newlines(inner)
+                if inner_norm != inner:
+                    try:
+                        action = json.loads(inner_norm)
+                        normalized_applied = True
+                        # treat as non-compliant since we had to slice
+                        non_compliant = True
+                    except Exception:
+                        pass
+
+        if normalized_applied:
+            self._emit("agent.message", {"role": "info", "content": "Applied lenient JSON newline normalization (converted raw newlines in strings to \\n)."})
+        return action, cleaned, non_compliant
+
+    def _emit(self, type: str, data: Dict[str, Any]) -> None:
+        """Queue an event for the next _flush_events()."""
+        self._pending_events.append((type, data))
+
+    def _emit_many(self, events: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        self._pending_events.extend(events)
+
+    def _flush_events(self) -> None:
+        """Write queued events with one EventBus.emit_batch call."""
+        if self._pending_events:
+            events, self._pending_events = self._pending_events, []
+            self.bus.emit_batch(events)
+
+    async def _complete(self, model: str, messages: List[Message]) -> str:
+        """Call the provider, reusing a cached reply when the reply cache is on."""
+        cache = self._reply_cache
+        if cache is None:
+            return await self.provider.complete(model, messages)
+        key = _transcript_key(model, messages)
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return hit
+        reply = await self.provider.complete(model, messages)
+        cache[key] = reply
+        if len(cache) > 64:
+            cache.popitem(last=False)
+        return reply
+
+    def _push(self, transcript: List[Message], role: str, content: str) -> None:
+        """Append a message and keep the running transcript length in step."""
+        transcript.append({"role": role, "content": content})
+        self._transcript_chars += len(role) + len(content) + 8
+
     def _estimate_len(self, msgs: List[Message]) -> int:
-        total = 0
-        for m in msgs:
-            total += len(m.get("role", "")) + len(m.get("content", "")) + 8
-        return total
+        # str len() is O(1); the per-message overhead is added once
+        return sum(len(m.get("role", "")) + len(m.get("content", "")) for m in msgs) + 8 * len(msgs)
+
+    def _render_transcript(self, transcript: List[Message], ctx_max: int, per_msg_max: int) -> Tuple[List[Message], bool]:
+        """Build the provider view of `transcript` within the context limits.
+
+        Keeps the leading system message, clips each message to `per_msg_max`
+        chars and keeps the newest messages that fit in `ctx_max`, using a
+        running length total instead of re-measuring the candidate list. The
+        newest message is always kept, clipped further if it alone overflows
+        (to no fewer than _NEWEST_MIN_CHARS).
+        Messages that need no clipping are shared with `transcript`, not
+        copied. Also returns whether anything was clipped or dropped.
+
+        `transcript` must be the live transcript, whose length is tracked in
+        `_transcript_chars`; when it fits unclipped it is returned as is.
+        """
+        if self._transcript_chars <= ctx_max and (
+            per_msg_max <= 0 or all(len(m.get("content", "")) <= per_msg_max for m in transcript)
+        ):
+            return transcript, False
+        # Always keep the first system message
+        first = 1 if transcript and transcript[0].get("role") == "system" else 0
+        budget = ctx_max - self._estimate_len(transcript[:first])
+
+        # Walk back from the newest message to find where the kept window
+        # starts; _clip_middle output is exactly `limit` chars, so clipped
+        # sizes are known without clipping yet
+        n = len(transcript)
+        start = n
+        clip_at: List[int] = []
+        newest_cap: Optional[int] = None
+        was_trimmed = False
+        for i in range(n - 1, first - 1, -1):
+            m = transcript[i]
+            role = m.get("role", "user")
+            clen = len(m.get("content", ""))
+            if per_msg_max > 0 and clen > per_msg_max:
+                clen = per_msg_max
+                clip_at.append(i)
+                was_trimmed = True
+            size = len(role) + clen + 8
+            if size > budget:
+                if start == n:
+                    start = i
+                    # Clip the newest message once, from its original content,
+                    # and never below a floor: a long system prompt must not
+                    # squeeze the current task down to nothing
+                    newest_cap = max(budget - len(role) - 8, _NEWEST_MIN_CHARS)
+                    if per_msg_max > 0:
+                        newest_cap = min(newest_cap, per_msg_max)
+                    if clip_at and clip_at[-1] == i:
+                        clip_at.pop()
+                was_trimmed = True
+                break
+            budget -= size
+            start = i
+
+        view = transcript[:first] + transcript[start:] if first else transcript[start:]
+        # Messages are never mutated in place, so only clipped ones are copied
+        shift = first - start
+        for i in clip_at:
+            if i >= start:
+                m = view[i + shift]
+                view[i + shift] = {"role": m.get("role", "user"), "content": _clip_middle(m.get("content", ""), per_msg_max)}
+        if newest_cap is not None:
+            m = view[-1]
+            view[-1] = {"role": m.get("role", "user"), "content": _clip_middle(m.get("content", ""), newest_cap)}
+        return view, was_trimmed
 
     def _shrink_older_command_outputs_inplace(self, transcript: List[Message], keep_recent: int = 10, older_tail_lines: int = 5) -> None:
         """Shrink outputs of command messages older than the last `keep_recent`.
@@ -569,14 +939,16 @@ class AgentRunner:
                 new_lines.extend(new_body)
                 new_content = "\n".join(new_lines)
                 transcript[idx] = {"role": msg.get("role", "user"), "content": new_content}
+                self._transcript_chars += len(new_content) - len(content)
             except Exception:
                 # Best effort; skip malformed entries
                 continue
 
-    async def _summarize_transcript_inplace(self, transcript: List[Message], model: Optional[str]):
+    async def _summarize_transcript_inplace(self, transcript: List[Message], model: Optional[str], ctx_max: int):
         if self.is_summarizing:
             return  # Avoid recursive summarization
         self.is_summarizing = True
+        self._last_summary_chars = self._transcript_chars
         
         try:
             self.bus.emit("agent.message", {"role": "info", "content": "Context is full, attempting to summarize..."})
@@ -603,9 +975,15 @@ class AgentRunner:
             if not messages_to_summarize:
                 return  # Nothing to summarize
 
+            # A provider call is only worth it if the summary frees real space
+            middle_chars = self._estimate_len(messages_to_summarize)
+            if middle_chars < max(ctx_max // 10, 5000):
+                self.bus.emit("agent.message", {"role": "info", "content": "Older messages are too short to be worth summarizing, will use truncation."})
+                return
+
             # 2. Create summarization request
-            # Flatten the messages to summarize into a single string for the prompt
-            condensed_log = "\n".join([f"<{m['role']}>\n{m['content']}\n</{m['role']}>" for m in messages_to_summarize])
+            # Flatten the messages to summarize into the prompt text in one join
+            log_text = "\n".join(f"<{m['role']}>\n{m['content']}\n</{m['role']}>" for m in messages_to_summarize)
 
             summary_request_transcript: List[Message] = [
                 {"role": "system", "content": (
@@ -614,7 +992,7 @@ class AgentRunner:
                     "what files were changed, and what the agent was trying to do last. "
                     "This summary will replace the original log to save space, so it must be accurate and informative for the agent to continue its task."
                 )},
-                {"role": "user", "content": f"Please summarize this conversation log:\n\n{condensed_log}"}
+                {"role": "user", "content": "Please summarize this conversation log:\n\n" + log_text}
             ]
 
             # 3. Call provider to get summary
@@ -639,6 +1017,7 @@ class AgentRunner:
             # Replace original transcript
             transcript.clear()
             transcript.extend(new_transcript)
+            self._transcript_chars = self._last_summary_chars = self._estimate_len(transcript)
 
         except Exception as e:
             self.bus.emit("agent.error", {"error": f"Failed to summarize transcript: {e}"})
@@ -6,9 +6,10 @@ import signal
 import sys
 import time
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-from agent_async.core.events import ConsolePrinter, EventBus
-from agent_async.core.run_registry import RunRegistry
+from agent_async.core.events import ConsolePrinter, EventBus, QueuedSink
+from agent_async.core.run_registry import Run, RunRegistry
 from agent_async.exec.local import LocalExecutor
 from agent_async.agent.loop import AgentRunner
 from agent_async.providers.factory import provider_from_name
@@ -34,6 +35,14 @@ def make_parser() -> argparse.ArgumentParser:
     start.add_argument("--system-prompt", default=None, help="Custom system prompt to use (optional)")
     start.add_argument("--debug", action="store_true", help="Enable debug mode for HTTP requests")
 
+    batch = sub.add_parser("start-batch", help="Run several tasks concurrently, one run per task")
+    batch.add_argument("--repo", required=True, help="Default repo path for tasks that do not set one")
+    batch.add_argument("--provider", default="simple", help="Provider: openai|claude|gemini|xai|deepseek|simple")
+    batch.add_argument("--model", default=None, help="Default model name, provider-specific")
+    batch.add_argument("--tasks-file", required=True, help='JSONL file: one {"task": ..., "repo"?: ..., "model"?: ...} per line')
+    batch.add_argument("--max-concurrency", type=int, default=4, help="Max runs executing at once")
+    batch.add_argument("--system-prompt", default=None, help="Custom system prompt to use (optional)")
+
     watch = sub.add_parser("watch", help="Watch an existing run's events")
     watch.add_argument("--run", required=True, help="Run id to watch")
 
@@ -76,7 +85,9 @@ async def start_run(args: argparse.Namespace) -> int:
     # Foreground streaming execution
     event_bus = EventBus(run.events_path)
     printer = ConsolePrinter()
-    event_bus.subscribe(printer.handle)
+    # Print from a background thread so a slow terminal does not stall the agent
+    console = QueuedSink(printer.handle)
+    event_bus.subscribe(console)
 
     provider = provider_from_name(args.provider, system_prompt=args.system_prompt)
     event_bus.emit("agent.message", {"role": "info", "content": f"System prompt:\n---\n{provider.system_prompt}\n---"})
@@ -88,9 +99,85 @@ async def start_run(args: argparse.Namespace) -> int:
     except KeyboardInterrupt:
         event_bus.emit(type="agent.error", data={"error": "Interrupted"})
         return 130
+    finally:
+        console.close()
+        event_bus.close()
     return 0
 
 
+def _load_batch_specs(path: str, default_repo: str, default_model: Optional[str]) -> List[Dict[str, Any]]:
+    """Read and validate a start-batch tasks file.
+
+    Each non-blank line is a JSON string (the task) or an object with "task"
+    and optional "repo"/"model". Every line is checked before any run is
+    created; the first problem exits with its file and line number.
+    """
+    specs: List[Dict[str, Any]] = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            where = f"{path}:{lineno}"
+            try:
+                spec = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SystemExit(f"{where}: invalid JSON: {e.msg}")
+            if isinstance(spec, str):
+                spec = {"task": spec}
+            if not isinstance(spec, dict):
+                raise SystemExit(f"{where}: expected a task string or an object, got {type(spec).__name__}")
+            task = spec.get("task")
+            if not isinstance(task, str) or not task.strip():
+                raise SystemExit(f'{where}: "task" must be a non-empty string')
+            for key in ("repo", "model"):
+                if spec.get(key) is not None and not isinstance(spec[key], str):
+                    raise SystemExit(f'{where}: "{key}" must be a string')
+            repo = Path(spec.get("repo") or default_repo).expanduser().resolve()
+            if not repo.is_dir():
+                raise SystemExit(f"{where}: repo path not found or not a directory: {repo}")
+            specs.append({"task": task, "repo": repo, "model": spec.get("model") or default_model})
+    return specs
+
+
+async def start_batch(args: argparse.Namespace) -> int:
+    specs = _load_batch_specs(args.tasks_file, args.repo, args.model)
+
+    registry = RunRegistry(base_dir=Path.cwd() / "runs")
+    # One provider instance is shared by every run in the batch
+    provider = provider_from_name(args.provider, system_prompt=args.system_prompt)
+    runs = [
+        registry.create_run(
+            repo_path=spec["repo"],
+            provider=args.provider,
+            model=spec["model"],
+            task=spec["task"],
+            system_prompt=args.system_prompt,
+        )
+        for spec in specs
+    ]
+    sem = asyncio.Semaphore(max(1, args.max_concurrency))
+
+    async def one(run: Run) -> bool:
+        async with sem:
+            event_bus = EventBus(run.events_path)
+            runner = AgentRunner(event_bus=event_bus, provider=provider, executor=LocalExecutor(cwd=Path(run.repo_path)))
+            print(f"{run.id} started")
+            try:
+                await runner.run(run_id=run.id, task=run.task, model=run.model)
+            except Exception as e:
+                event_bus.emit(type="agent.error", data={"error": str(e)})
+                print(f"{run.id} failed: {e}")
+                return False
+            finally:
+                event_bus.close()
+            print(f"{run.id} finished")
+            return True
+
+    results = await asyncio.gather(*(one(r) for r in runs))
+    return 0 if all(results) else 1
+
+
 async def worker_mode(args: argparse.Namespace) -> int:
     run_dir = Path(args.run_dir).resolve()
     registry = RunRegistry(base_dir=Path.cwd() / "runs")
@@ -106,6 +193,8 @@ async def worker_mode(args: argparse.Namespace) -> int:
     except Exception as e:
         event_bus.emit(type="agent.error", data={"error": str(e)})
         return 1
+    finally:
+        event_bus.close()
     return 0
 
 
@@ -114,26 +203,51 @@ async def watch_run(args: argparse.Namespace) -> int:
     run = registry.get(args.run)
     printer = ConsolePrinter()
 
-    # Simple polling tail of the JSONL file
+    # Tail the JSONL file from a held handle, only consuming whole lines so
+    # an event caught mid-write is picked up on the next read
     events_path = run.events_path
-    last_size = 0
+    fh = None
+    partial = b""
+
+    def drain() -> None:
+        nonlocal fh, partial
+        if fh is None:
+            if not events_path.exists():
+                return
+            fh = events_path.open("rb")
+        chunk = fh.read()
+        if not chunk:
+            return
+        # Lines are UTF-8 regardless of locale; json.loads takes bytes
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        for line in lines:
+            try:
+                printer.handle(json.loads(line))
+            except Exception:
+                pass
+
+    try:
+        from watchfiles import awatch  # optional: wake on file changes instead of polling
+    except ImportError:
+        awatch = None
     try:
-        while True:
-            if events_path.exists():
-                size = events_path.stat().st_size
-                if size > last_size:
-                    with events_path.open("r") as f:
-                        f.seek(last_size)
-                        for line in f:
-                            try:
-                                evt = json.loads(line)
-                                printer.handle(evt)
-                            except Exception:
-                                pass
-                    last_size = size
-            await asyncio.sleep(0.25)
+        drain()
+        if awatch is not None:
+            # watchfiles may report the path in another form (absolute,
+            # symlinks resolved) than the one we were given
+            target = events_path.resolve()
+            async for _ in awatch(target.parent, watch_filter=lambda _change, path: Path(path).resolve() == target):
+                drain()
+        else:
+            while True:
+                drain()
+                await asyncio.sleep(0.25)
     except KeyboardInterrupt:
         return 0
+    finally:
+        if fh is not None:
+            fh.close()
 
 
 def main(argv=None) -> int:
@@ -141,6 +255,8 @@ def main(argv=None) -> int:
     args = parser.parse_args(argv)
     if args.cmd == "start":
         return asyncio.run(start_run(args))
+    if args.cmd == "start-batch":
+        return asyncio.run(start_batch(args))
     if args.cmd == "watch":
         return asyncio.run(watch_run(args))
     if args.cmd == "worker":
@@ -1,81 +1,237 @@
 import json
+import os
+import queue
 import sys
+import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+def _json_bytes(obj: Any) -> bytes:
+    try:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    except UnicodeEncodeError:
+        # Lone surrogates (e.g. from undecodable output) survive as escapes
+        return json.dumps(obj).encode("ascii")
+
+
+try:  # optional: faster serialization of every event line
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            return _json_bytes(obj)
+
+    _SEP, _COLON = b",", b":"
+except ImportError:
+    _dumps = _json_bytes
+    _SEP, _COLON = b", ", b": "
+
+_TS_HEAD = b'{"ts_ns"' + _COLON
+# Per event type, the serialized envelope between the timestamp and the data
+_TYPE_PARTS: Dict[str, bytes] = {}
+
+
+def _event_line(ts_ns: int, type: str, data: Dict[str, Any]) -> bytes:
+    """Serialize {"ts_ns", "type", "data"} as one jsonl line, reusing the envelope."""
+    part = _TYPE_PARTS.get(type)
+    if part is None:
+        part = _TYPE_PARTS[type] = _SEP + b'"type"' + _COLON + _dumps(type) + _SEP + b'"data"' + _COLON
+    return b"".join((_TS_HEAD, str(ts_ns).encode("ascii"), part, _dumps(data), b"}\n"))
 
 
 class EventBus:
     def __init__(self, jsonl_path: Path):
         self.path = jsonl_path
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        self._sinks: List[Callable[[Dict[str, Any]], None]] = []
+        # Copy-on-write: subscribe() rebinds a new tuple, so emit() can
+        # iterate it directly without a defensive copy
+        self._sinks: Tuple[Callable[[Dict[str, Any]], None], ...] = ()
+        # One binary append handle for the bus's lifetime, flushed after each
+        # write so readers tailing the file see every event right away
+        self._fh = self.path.open("ab")
+        self._lock = threading.Lock()
 
     def subscribe(self, sink: Callable[[Dict[str, Any]], None]) -> None:
-        self._sinks.append(sink)
+        self._sinks = self._sinks + (sink,)
+
+    def _append(self, data: bytes) -> None:
+        with self._lock:
+            if self._fh.closed:
+                self._fh = self.path.open("ab")
+            self._fh.write(data)
+            self._fh.flush()
+
+    def close(self) -> None:
+        """Close the jsonl handle; a later emit reopens it."""
+        with self._lock:
+            self._fh.close()
 
     def emit(self, type: str, data: Dict[str, Any]) -> None:
-        evt = {"ts": time.time(), "type": type, "data": data}
+        # Integer nanoseconds: exact ordering and no float formatting
+        ts_ns = time.time_ns()
         # append to jsonl
-        with self.path.open("a") as f:
-            f.write(json.dumps(evt, ensure_ascii=False) + "\n")
-        for s in list(self._sinks):
+        self._append(_event_line(ts_ns, type, data))
+        if not self._sinks:
+            return
+        evt = {"ts_ns": ts_ns, "type": type, "data": data}
+        for s in self._sinks:
             try:
                 s(evt)
             except Exception:
                 pass
 
+    def emit_batch(self, events: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Emit several events in order with a single append to the jsonl file."""
+        ts_ns = time.time_ns()
+        events = list(events)
+        if not events:
+            return
+        self._append(b"".join(_event_line(ts_ns, t, d) for t, d in events))
+        if not self._sinks:
+            return
+        evts = [{"ts_ns": ts_ns, "type": t, "data": d} for t, d in events]
+        sinks = self._sinks
+        for evt in evts:
+            for s in sinks:
+                try:
+                    s(evt)
+                except Exception:
+                    pass
+
+
+class QueuedSink:
+    """Run a slow sink on a background thread so emit() does not wait on it.
+
+    Events are handed over through a bounded queue; when it is full, emit()
+    blocks until the sink catches up, so events are never dropped. Call
+    close() to deliver everything still queued.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink: Callable[[Dict[str, Any]], None], maxsize: int = 4096):
+        self._sink = sink
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def __call__(self, evt: Dict[str, Any]) -> None:
+        self._q.put(evt)
+
+    def _drain(self) -> None:
+        while True:
+            evt = self._q.get()
+            if evt is self._STOP:
+                return
+            try:
+                self._sink(evt)
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._q.put(self._STOP)
+            self._thread.join()
+
+
+def _stream_fd(stream: Any) -> Optional[int]:
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None  # not backed by a real fd (e.g. captured output)
+
 
 class ConsolePrinter:
+    def __init__(self) -> None:
+        # Command output goes straight to the fds, bypassing TextIO buffering
+        self._out_fd = _stream_fd(sys.stdout)
+        self._err_fd = _stream_fd(sys.stderr)
+        # Event type -> formatter; unknown types are ignored
+        self._dispatch: Dict[str, Callable[[Dict[str, Any]], None]] = {
+            "agent.command": self._on_command,
+            "proc.stdout": self._on_stdout,
+            "proc.stderr": self._on_stderr,
+            "agent.message": self._on_message,
+            "agent.error": self._on_error,
+            "agent.done": self._on_done,
+            "provider.reply": self._on_reply,
+            "provider.start": self._on_provider_start,
+            "provider.end": self._on_provider_end,
+        }
+
+    @staticmethod
+    def _write_raw(stream: Any, fd: Optional[int], text: str) -> None:
+        if fd is None:
+            stream.write(text)
+            stream.flush()
+            return
+        # Keep order with print() output still buffered in the stream
+        stream.flush()
+        data = memoryview(text.encode(getattr(stream, "encoding", None) or "utf-8", "replace"))
+        while data:
+            data = data[os.write(fd, data):]
+
     def handle(self, evt: Dict[str, Any]) -> None:
-        t = evt.get("type")
-        d = evt.get("data", {})
-        if t == "agent.command":
-            cmd = d.get("cmd", "")
-            print(f"\n$ {cmd}")
-        elif t == "proc.stdout":
-            text = d.get("text", "")
-            if text:
-                sys.stdout.write(text)
-                sys.stdout.flush()
-        elif t == "proc.stderr":
-            text = d.get("text", "")
-            if text:
-                sys.stderr.write(text)
-                sys.stderr.flush()
-        elif t == "agent.message":
-            role = d.get("role", "agent")
-            content = d.get("content", "")
-            print(f"\n[{role}] {content}")
-        elif t == "agent.error":
-            print(f"\n[error] {d.get('error')}")
-        elif t == "agent.done":
-            print("\n[done] agent completed")
-        elif t == "provider.reply":
-            path = d.get("file", "")
-            b = d.get("bytes")
-            print(f"\n[provider.reply] {b} bytes saved to {path}")
-        elif t == "provider.start":
-            prov = d.get("provider", "")
-            model = d.get("model", "")
-            msgs = d.get("messages")
-            extra = f" msgs={msgs}" if msgs is not None else ""
-            print(f"\n[provider.start] {prov} {model}{extra}")
-        elif t == "provider.end":
-            prov = d.get("provider", "")
-            model = d.get("model", "")
-            ok = d.get("ok")
-            dur = d.get("duration_ms")
-            err = d.get("error")
-            canceled = d.get("cancelled")
-            parts = [f"[provider.end] {prov} {model}"]
-            if ok is not None:
-                parts.append(f"ok={ok}")
-            if dur is not None:
-                parts.append(f"{dur}ms")
-            if canceled:
-                parts.append("cancelled")
-            if err:
-                parts.append(f"error={err}")
-            print("\n" + " ".join(parts))
+        h = self._dispatch.get(evt.get("type"))
+        if h:
+            h(evt.get("data", {}))
+
+    def _on_command(self, d: Dict[str, Any]) -> None:
+        cmd = d.get("cmd", "")
+        print(f"\n$ {cmd}")
+
+    def _on_stdout(self, d: Dict[str, Any]) -> None:
+        text = d.get("text", "")
+        if text:
+            self._write_raw(sys.stdout, self._out_fd, text)
+
+    def _on_stderr(self, d: Dict[str, Any]) -> None:
+        text = d.get("text", "")
+        if text:
+            self._write_raw(sys.stderr, self._err_fd, text)
+
+    def _on_message(self, d: Dict[str, Any]) -> None:
+        role = d.get("role", "agent")
+        content = d.get("content", "")
+        print(f"\n[{role}] {content}")
+
+    def _on_error(self, d: Dict[str, Any]) -> None:
+        print(f"\n[error] {d.get('error')}")
+
+    def _on_done(self, d: Dict[str, Any]) -> None:
+        print("\n[done] agent completed")
+
+    def _on_reply(self, d: Dict[str, Any]) -> None:
+        path = d.get("file", "")
+        b = d.get("bytes")
+        print(f"\n[provider.reply] {b} bytes saved to {path}")
+
+    def _on_provider_start(self, d: Dict[str, Any]) -> None:
+        prov = d.get("provider", "")
+        model = d.get("model", "")
+        msgs = d.get("messages")
+        extra = f" msgs={msgs}" if msgs is not None else ""
+        print(f"\n[provider.start] {prov} {model}{extra}")
+
+    def _on_provider_end(self, d: Dict[str, Any]) -> None:
+        prov = d.get("provider", "")
+        model = d.get("model", "")
+        ok = d.get("ok")
+        dur = d.get("duration_ms")
+        err = d.get("error")
+        canceled = d.get("cancelled")
+        parts = [f"[provider.end] {prov} {model}"]
+        if ok is not None:
+            parts.append(f"ok={ok}")
+        if dur is not None:
+            parts.append(f"{dur}ms")
+        if canceled:
+            parts.append("cancelled")
+        if err:
+            parts.append(f"error={err}")
+        print("\n" + " ".join(parts))
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+import os
+import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
@@ -19,6 +21,15 @@ class RepoStore:
         self.path = path
         self.max_items = max_items
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The file is read once and then served from memory; this store is
+        # its only writer, so every add writes the cache through to disk
+        self._items: Optional[Dict[str, RepoEntry]] = None
+        self._lock = threading.Lock()
+
+    def _cached(self) -> Dict[str, RepoEntry]:
+        if self._items is None:
+            self._items = self._load()
+        return self._items
 
     def _load(self) -> Dict[str, RepoEntry]:
         if not self.path.exists():
@@ -40,26 +51,36 @@ class RepoStore:
             return {}
 
     def _save(self, items: Dict[str, RepoEntry]) -> None:
-        # Keep top-N by last_used
+        # Keep top-N by last_used, in memory as well as on disk
         sorted_items = sorted(items.values(), key=lambda r: r.last_used, reverse=True)[: self.max_items]
+        if len(sorted_items) < len(items):
+            kept = {r.url for r in sorted_items}
+            for url in [u for u in items if u not in kept]:
+                del items[url]
         payload = {"repos": [{"url": r.url, "last_used": r.last_used, "used_count": r.used_count} for r in sorted_items]}
-        self.path.write_text(json.dumps(payload, indent=2))
+        # Write a temp file and rename it over the old one so readers never
+        # see a partial file
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(payload, indent=2))
+        os.replace(tmp, self.path)
 
     def list(self) -> List[RepoEntry]:
-        items = self._load()
-        return sorted(items.values(), key=lambda r: r.last_used, reverse=True)
+        with self._lock:
+            items = list(self._cached().values())
+        return sorted(items, key=lambda r: r.last_used, reverse=True)
 
     def add(self, url: str) -> None:
         url = (url or "").strip()
         if not url:
             return
-        items = self._load()
-        now = time.time()
-        if url in items:
-            e = items[url]
-            e.last_used = now
-            e.used_count += 1
-        else:
-            items[url] = RepoEntry(url=url, last_used=now, used_count=1)
-        self._save(items)
+        with self._lock:
+            items = self._cached()
+            now = time.time()
+            if url in items:
+                e = items[url]
+                e.last_used = now
+                e.used_count += 1
+            else:
+                items[url] = RepoEntry(url=url, last_used=now, used_count=1)
+            self._save(items)
 
@@ -1,6 +1,7 @@
 import json
+import os
+import secrets
 import time
-import uuid
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
@@ -29,7 +30,8 @@ class RunRegistry:
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
     def create_run(self, repo_path: Path, provider: str, model: Optional[str], task: str, repo_url: Optional[str] = None, system_prompt: Optional[str] = None, truncate_limit: Optional[int] = None) -> Run:
-        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        # Same shape as before (timestamp + 8 hex chars), without building a UUID
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
         run_dir = self.base_dir / run_id
         run_dir.mkdir(parents=True, exist_ok=True)
         meta = {
@@ -42,7 +44,10 @@ class RunRegistry:
             "system_prompt": system_prompt,
             "truncate_limit": truncate_limit,
         }
-        (run_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+        # Compact, and renamed into place so readers never see a partial file
+        tmp = run_dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta, separators=(",", ":")))
+        os.replace(tmp, run_dir / "meta.json")
         return Run(id=run_id, dir=run_dir, repo_path=str(repo_path), repo_url=repo_url, provider=provider, model=model, task=task, system_prompt=system_prompt, truncate_limit=truncate_limit)
 
     def get(self, run_id: str) -> Run:
@@ -1,5 +1,12 @@
 import asyncio
-from typing import AsyncIterator, Optional, Callable
+import codecs
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+# Max bytes taken from a pipe per output chunk (Linux pipe capacity)
+_READ_CHUNK = 65536
+# StreamReader buffer limit; reading from the pipe pauses at twice this, so a
+# burst of output can be buffered while the consumer is busy
+_STREAM_LIMIT = 1 << 20
 
 
 class LocalExecutor:
@@ -16,47 +23,49 @@ class LocalExecutor:
             cwd=self.cwd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
+            limit=_STREAM_LIMIT,
         )
 
-        async def read_stream(stream, name):
+        # One pump per pipe feeds a shared queue; a None payload marks EOF.
+        # read() returns whatever is buffered up to the limit, so a large
+        # limit coalesces bursts of output without delaying slow output.
+        q: "asyncio.Queue[Tuple[str, Optional[bytes]]]" = asyncio.Queue(maxsize=64)
+
+        async def pump(stream, name):
             while True:
-                data = await stream.read(1024)
+                data = await stream.read(_READ_CHUNK)
                 if not data:
                     break
-                yield name, data.decode(errors="replace")
-
-        # Concurrently read both streams
-        stdout_iter = read_stream(proc.stdout, "stdout")
-        stderr_iter = read_stream(proc.stderr, "stderr")
-
-        pending = {asyncio.create_task(stdout_iter.__anext__()), asyncio.create_task(stderr_iter.__anext__())}
-        while pending:
-            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
-            for task in done:
-                try:
-                    item = task.result()
-                except StopAsyncIteration:
-                    # stop creating new tasks for this iterator
-                    continue
+                await q.put((name, data))
+            await q.put((name, None))
+
+        # Incremental decoders keep multi-byte characters split across reads intact
+        decoders = {
+            "stdout": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            "stderr": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        }
+        pumps = [asyncio.create_task(pump(proc.stdout, "stdout")), asyncio.create_task(pump(proc.stderr, "stderr"))]
+        open_streams = len(pumps)
+        try:
+            while open_streams:
+                name, data = await q.get()
+                if data is None:
+                    open_streams -= 1
+                    text = decoders[name].decode(b"", final=True)
                 else:
-                    stream_name, text = item
-                    yield stream_name, text
-                    # re-queue task for next chunk
-                    if stream_name == "stdout":
-                        pending.add(asyncio.create_task(stdout_iter.__anext__()))
-                    else:
-                        pending.add(asyncio.create_task(stderr_iter.__anext__()))
-
-            # Cooperative cancellation: terminate process if requested
-            if cancel_check and cancel_check():
-                try:
-                    proc.terminate()
-                except ProcessLookupError:
-                    pass
-                # cancel any remaining read tasks
-                for t in list(pending):
-                    t.cancel()
-                pending.clear()
-                break
+                    text = decoders[name].decode(data)
+                if text:
+                    yield name, text
+
+                # Cooperative cancellation: terminate process if requested
+                if cancel_check and cancel_check():
+                    try:
+                        proc.terminate()
+                    except ProcessLookupError:
+                        pass
+                    break
+        finally:
+            for t in pumps:
+                t.cancel()
 
         await proc.wait()
@@ -32,15 +32,7 @@ class Provider(abc.ABC):
         return []
 
 
-@dataclass
-class SimpleProvider(Provider):
-    name: str = "simple"
-
-    def __init__(self, api_key: Optional[str] = None, system_prompt: Optional[str] = None):
-        super().__init__(api_key, system_prompt)
-
-    def _get_default_system_prompt(self) -> str:
-        return """You are a coding agent running in the Codex CLI, a terminal-based coding assistant. Codex CLI is an open source project. You are expected to be precise, safe, and helpful.
+_DEFAULT_SYSTEM_PROMPT = """You are a coding agent running in the Codex CLI, a terminal-based coding assistant. Codex CLI is an open source project. You are expected to be precise, safe, and helpful.
 
 Your capabilities:
 - Receive user prompts and other context provided by the harness, such as files in the workspace.
@@ -123,6 +115,17 @@ Safety and cleanliness:
 - Before finishing, ensure no compiled binaries or build artifacts are left in the working tree or staged for commit. Remove typical artifacts (e.g., __pycache__/, *.pyc, dist/, build/, node_modules/, *.o, *.so, *.dll, *.exe, target/, *.class) or add appropriate .gitignore entries and run a safe cleanup (e.g., `git clean -fdX` after confirming ignores). Do not include built artifacts in any commits or PRs.
 - Cleanup step: Always run a cleanup command before replying with type "done". Prefer `git clean -fdX` to remove ignored build outputs. If artifacts aren't ignored, explicitly delete common build directories/files (e.g., `rm -rf -- dist build target out .venv .tox .pytest_cache node_modules */bin */obj *.o *.so *.dll *.exe *.class __pycache__`).""".strip()
 
+
+@dataclass
+class SimpleProvider(Provider):
+    name: str = "simple"
+
+    def __init__(self, api_key: Optional[str] = None, system_prompt: Optional[str] = None):
+        super().__init__(api_key, system_prompt)
+
+    def _get_default_system_prompt(self) -> str:
+        return _DEFAULT_SYSTEM_PROMPT
+
     async def complete(self, model: str, messages: List[Message]) -> str:
         # A minimal, deterministic provider for offline demo.
         last_user = next((m for m in reversed(messages) if m["role"] == "user"), {"content": ""})
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .base import Message, Provider
+
+
+# Model lists change on the order of hours; keep successful remote lookups so
+# repeated /api/models calls skip the round trip. Keyed by provider and a hash
+# of the API key (different keys can see different models).
+MODELS_TTL = 3600.0
+_MODELS_MAX = 64
+
+_models_lock = threading.Lock()
+_models: Dict[str, Tuple[float, List[str]]] = {}
+
+
+def _models_key(provider: str, api_key: Optional[str]) -> str:
+    digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    return f"{provider}:{digest}"
+
+
+def get_models(provider: str, api_key: Optional[str]) -> Optional[List[str]]:
+    key = _models_key(provider, api_key)
+    with _models_lock:
+        hit = _models.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[0] >= MODELS_TTL:
+            del _models[key]
+            return None
+        return list(hit[1])
+
+
+def put_models(provider: str, api_key: Optional[str], models: List[str]) -> None:
+    key = _models_key(provider, api_key)
+    with _models_lock:
+        if key not in _models and len(_models) >= _MODELS_MAX:
+            # Drop the oldest entry
+            del _models[min(_models, key=lambda k: _models[k][0])]
+        _models[key] = (time.monotonic(), list(models))
+
+
+def response_key(model: str, system: Optional[str], messages: List[Message]) -> str:
+    """Cache key for one completion request (sampling options excluded)."""
+    payload = json.dumps({"model": model, "system": system, "messages": messages}, sort_keys=True, default=str)
+    return f"chat:{model}:{hashlib.sha256(payload.encode('utf-8', 'surrogatepass')).hexdigest()}"
+
+
+class ResponseCache:
+    """In-process LRU of completion replies with a TTL."""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            if time.monotonic() - hit[0] >= self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return hit[1]
+
+    def set(self, key: str, text: str) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic(), text)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+# One cache per process so every run (CLI batch, server workers) shares hits
+_responses = ResponseCache()
+# Requests currently on the wire, by cache key; concurrent identical requests
+# on the same event loop await the first one instead of sending their own
+_inflight: Dict[str, "asyncio.Future[str]"] = {}
+
+
+def cache_mode() -> Optional[Tuple[bool, bool]]:
+    """Parse AGENT_ASYNC_CACHE into (read, write); None when caching is off."""
+    mode = (os.environ.get("AGENT_ASYNC_CACHE") or "").strip().lower()
+    if mode in ("readwrite", "1", "true", "yes"):
+        return True, True
+    if mode == "readonly":
+        return True, False
+    if mode == "writeonly":
+        return False, True
+    return None
+
+
+class CachingProvider(Provider):
+    """Wrap a provider so identical complete() requests are answered from cache."""
+
+    def __init__(self, inner: Provider, read: bool = True, write: bool = True, cache: Optional[ResponseCache] = None):
+        self.inner = inner
+        self.name = inner.name
+        self.read = read
+        self.write = write
+        self.cache = cache if cache is not None else _responses
+        super().__init__(inner.api_key, inner.system_prompt)
+
+    def _get_default_system_prompt(self) -> str:
+        return self.inner.system_prompt
+
+    async def complete(self, model: str, messages: List[Message]) -> str:
+        key = response_key(model, self.inner.system_prompt, messages)
+        loop = asyncio.get_running_loop()
+        if self.read:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+            while True:
+                pending = _inflight.get(key)
+                if pending is None or pending.get_loop() is not loop:
+                    break
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    # The first caller was cancelled, not us: send our own
+                    if pending.cancelled():
+                        continue
+                    raise
+        fut: "asyncio.Future[str]" = loop.create_future()
+        if self.read:
+            _inflight[key] = fut
+        try:
+            text = await self.inner.complete(model, messages)
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody was waiting
+            raise
+        except BaseException:
+            fut.cancel()
+            raise
+        finally:
+            if _inflight.get(key) is fut:
+                del _inflight[key]
+        fut.set_result(text)
+        if self.write and text:
+            self.cache.set(key, text)
+        return text
+
+    async def list_models(self) -> List[str]:
+        return await self.inner.list_models()
@@ -3,65 +3,54 @@ from __future__ import annotations
 import os
 from typing import List
 
+from ..agent.prompt import AGENT_JSON_PROMPT
+from . import cache
 from .base import Message, Provider
 from .util_http import http_get_json, http_post_json
 
 
+_MESSAGES_URL = "https://api.anthropic.com/v1/messages"
+# Roles the Messages API accepts; anything else (tool, function) is sent as user
+_ANTHROPIC_ROLES = frozenset({"user", "assistant"})
+
+
 class ClaudeProvider(Provider):
     name = "claude"
 
     def __init__(self, api_key: str | None = None, system_prompt: str | None = None):
         key = api_key if api_key is not None else os.environ.get("ANTHROPIC_API_KEY")
         super().__init__(key.strip() if key else None, system_prompt)
+        # Static per-key request headers (util_http copies them per request)
+        self._headers = {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"} if self.api_key else {}
 
     def _get_default_system_prompt(self) -> str:
-        return (
-            "You are an autonomous AI coding agent. Your goal is to complete the task by executing shell commands.\n\n"
-            "**RESPONSE FORMAT**\n"
-            "- Respond with EXACTLY one JSON object and nothing else.\n"
-            '- The JSON object must have this schema:\n'
-            '  {"type": "run" | "message" | "done", "cmd?": string, "message?": string, "thought": string}\n\n'
-            "**RULES**\n"
-            "1.  **JSON Only:** Your entire response must be a single, valid JSON object. No markdown, no commentary, no text outside the JSON.\n"
-            "2.  File edits: Prefer minimal in-place edits to save tokens. Use full-file here-doc only when necessary.\n"
-            "    - Preferred (portable): Python to read/modify/write a file (use replace/regex/insert).\n"
-            "      If available, you may call the helper: python3 ../../agent_async/scripts/edit.py replace|regex|insert_after|ensure_block ...\n"
-            "    - Full rewrite (when needed):\n"
-            "      cat > path/to/file <<EOF\\n...content...\\nEOF\n"
-            "3.  **Output Truncation:** Only the last 200 lines of each command's combined stdout/stderr are provided back to you in the conversation context. Prefer commands that focus output (tail/grep/rg).\n"
-            "4.  **File Reading:** Use head -n 100 <file> or grep <pattern> <file>. Avoid cat on large files.\n"
-            "5.  **No Human:** You have no human to ask for help. Discover information via commands.\n"
-            "6.  **Finish:** When the task is complete, reply with {\"type\":\"done\", \"message\":\"I have completed the task.\"}."
-            "\n\n**Safety and cleanliness**\n"
-            "- Before finishing, ensure no compiled binaries or build artifacts remain in the working tree or staged for commit. Remove typical artifacts (e.g., __pycache__/, *.pyc, dist/, build/, node_modules/, *.o, *.so, *.dll, *.exe, target/, *.class) or add appropriate .gitignore entries and run a safe cleanup (e.g., `git clean -fdX` after confirming ignores). Do not include built artifacts in any commits or PRs.\n"
-            "- Cleanup step: Always run a cleanup command before replying with type 'done'. Prefer `git clean -fdX` to remove ignored build outputs. If artifacts aren't ignored, explicitly delete common build directories/files (e.g., `rm -rf -- dist build target out .venv .tox .pytest_cache node_modules */bin */obj *.o *.so *.dll *.exe *.class __pycache__`)."
-        ).strip()
+        return AGENT_JSON_PROMPT
 
-    async def complete(self, model: str, messages: List[Message]) -> str:
+    def _request_body(self, model: str, messages: List[Message]) -> dict:
         if not self.api_key:
             raise RuntimeError("Anthropic API key required for completion")
         if not model:
             model = "claude-3-5-sonnet-latest"
 
-        # Separate system messages to pass as system instruction
-        sys_msgs = [m.get("content", "") for m in messages if m.get("role") == "system"]
-        system_instruction = "\n\n".join([s for s in sys_msgs if isinstance(s, str)]).strip() or None
-
-        # Map messages to Anthropic format (user/assistant roles only)
+        # One pass: system messages become the system instruction, the rest
+        # map to Anthropic format (user/assistant roles only)
+        sys_parts: list[str] = []
         anthro_messages = []
         for m in messages:
             role = m.get("role")
+            content = m.get("content", "")
             if role == "system":
+                if isinstance(content, str):
+                    sys_parts.append(content)
                 continue
-            if role not in ("user", "assistant"):
-                role = "user"
-            anthro_messages.append({"role": role, "content": m.get("content", "")})
-
-        url = "https://api.anthropic.com/v1/messages"
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-        }
+            anthro_messages.append({"role": role if role in _ANTHROPIC_ROLES else "user", "content": content})
+        system_instruction = "\n\n".join(sys_parts).strip() or None
+        # Mark the end of the conversation as a prompt-cache breakpoint: the
+        # agent only appends turns, so the next request reuses this prefix
+        if anthro_messages and anthro_messages[-1]["content"]:
+            last = anthro_messages[-1]
+            last["content"] = [{"type": "text", "text": last["content"], "cache_control": {"type": "ephemeral"}}]
+
         body = {
             "model": model,
             "messages": anthro_messages,
@@ -70,13 +59,17 @@ class ClaudeProvider(Provider):
             "temperature": 0.1,
         }
         if system_instruction:
-            body["system"] = system_instruction
+            # The system prompt is the static head of every request; cache it
+            body["system"] = [{"type": "text", "text": system_instruction, "cache_control": {"type": "ephemeral"}}]
+        return body
 
+    async def complete(self, model: str, messages: List[Message]) -> str:
+        body = self._request_body(model, messages)
         debug_flag = bool(os.environ.get("AGENT_ASYNC_DEBUG_HTTP"))
         data = await http_post_json(
-            url,
+            _MESSAGES_URL,
             body,
-            headers=headers,
+            headers=self._headers,
             timeout=90,
             retries=2,
             backoff=1.8,
@@ -87,13 +80,13 @@ class ClaudeProvider(Provider):
             raise RuntimeError(f"Anthropic API error: {msg}")
 
         # Extract text from Anthropic message content
-        parts = data.get("content") or []
-        texts: list[str] = []
-        for p in parts:
-            if isinstance(p, dict) and p.get("type") == "text" and p.get("text"):
-                texts.append(str(p.get("text")))
-        if texts:
-            return "".join(texts)
+        text = "".join(
+            str(p["text"])
+            for p in data.get("content") or ()
+            if isinstance(p, dict) and p.get("type") == "text" and p.get("text")
+        )
+        if text:
+            return text
 
         # Fallbacks on some SDKs
         if isinstance(data.get("output_text"), str):
@@ -109,20 +102,22 @@ class ClaudeProvider(Provider):
                 "claude-3-opus-latest",
                 "claude-3-5-haiku-latest",
             ]
+        cached = cache.get_models(self.name, self.api_key)
+        if cached is not None:
+            return cached
         # Try Anthropic models endpoint (if available); fallback to static
         try:
             url = "https://api.anthropic.com/v1/models"
-            headers = {
-                "x-api-key": self.api_key,
-                "anthropic-version": "2023-06-01",
-            }
-            data = await http_get_json(url, headers=headers)
+            data = await http_get_json(url, headers=self._headers)
             arr = data.get("data") or data.get("models") or []
             items = []
             for it in arr:
                 if isinstance(it, dict):
                     items.append(it.get("id") or it.get("name"))
-            return [m for m in items if m]
+            items = [m for m in items if m]
+            if items:
+                cache.put_models(self.name, self.api_key, items)
+            return items
         except Exception:
             return [
                 "claude-3-5-sonnet-latest",
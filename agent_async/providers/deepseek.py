@@ -3,19 +3,14 @@ from __future__ import annotations
 import os
 from typing import List
 
+from . import cache
 from .base import Message, Provider
 from .util_http import http_get_json, http_post_json
 
 
-class DeepseekProvider(Provider):
-    name = "deepseek"
+_CHAT_KEYS = {"role", "content"}
 
-    def __init__(self, api_key: str | None = None, system_prompt: str | None = None):
-        key = api_key if api_key is not None else os.environ.get("DEEPSEEK_API_KEY")
-        super().__init__(key.strip() if key else None, system_prompt)
-
-    def _get_default_system_prompt(self) -> str:
-        return """You are DeepSeek, an expert AI coding agent that runs autonomously with no supervision.
+_DEFAULT_SYSTEM_PROMPT = """You are DeepSeek, an expert AI coding agent that runs autonomously with no supervision.
 
 You must respond with exactly one JSON object for actions. No explanations, no markdown, no extra text outside the JSON.
 
@@ -84,25 +79,38 @@ Safety and cleanliness:
 - Before finishing, ensure no compiled binaries or build artifacts are left in the working tree or staged for commit. Remove typical artifacts (e.g., __pycache__/, *.pyc, dist/, build/, node_modules/, *.o, *.so, *.dll, *.exe, target/, *.class) or add appropriate .gitignore entries and run a safe cleanup (e.g., `git clean -fdX` after confirming ignores). Do not include built artifacts in any commits or PRs.
 - Cleanup step: Always run a cleanup command before replying with type "done". Prefer `git clean -fdX` to remove ignored build outputs. If artifacts aren't ignored, explicitly delete common build directories/files (e.g., `rm -rf -- dist build target out .venv .tox .pytest_cache node_modules */bin */obj *.o *.so *.dll *.exe *.class __pycache__`).""".strip()
 
+
+class DeepseekProvider(Provider):
+    name = "deepseek"
+
+    def __init__(self, api_key: str | None = None, system_prompt: str | None = None):
+        key = api_key if api_key is not None else os.environ.get("DEEPSEEK_API_KEY")
+        super().__init__(key.strip() if key else None, system_prompt)
+        # Static per-key request headers (util_http copies them per request)
+        self._headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def _get_default_system_prompt(self) -> str:
+        return _DEFAULT_SYSTEM_PROMPT
+
     async def complete(self, model: str, messages: List[Message]) -> str:
         if not self.api_key:
             raise RuntimeError("Deepseek API key required for completion")
         if not model:
             model = "deepseek-chat"
 
-        chat_messages = []
-        for m in messages:
-            role = m.get("role", "user")
-            content = m.get("content", "")
-            chat_messages.append({"role": role, "content": content})
+        # Messages from the agent loop are already {role, content}; only
+        # rebuild the odd one that is missing a field or carries extras
+        chat_messages = [
+            m if m.keys() == _CHAT_KEYS else {"role": m.get("role", "user"), "content": m.get("content", "")}
+            for m in messages
+        ]
 
         url = "https://api.deepseek.com/chat/completions"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
         body = {"model": model, "messages": chat_messages}
         data = await http_post_json(
             url,
             body,
-            headers=headers,
+            headers=self._headers,
             timeout=90,
             retries=2,
             backoff=1.8,
@@ -126,9 +134,11 @@ Safety and cleanliness:
         try:
             if not self.api_key:
                 raise RuntimeError("Deepseek API key required")
+            cached = cache.get_models(self.name, self.api_key)
+            if cached is not None:
+                return cached
             url = "https://api.deepseek.com/v1/models"
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            data = await http_get_json(url, headers=headers)
+            data = await http_get_json(url, headers=self._headers)
             arr = data.get("data") or data.get("models") or []
             items = []
             for it in arr:
@@ -137,6 +147,7 @@ Safety and cleanliness:
                     if mid:
                         items.append(mid)
             if items:
+                cache.put_models(self.name, self.api_key, items)
                 return items
         except Exception:
             pass
@@ -1,27 +1,63 @@
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import importlib
+from functools import lru_cache
+from typing import Dict, List, Tuple, Type, Union
 
 from .base import Provider, SimpleProvider
-from .openai import OpenAIProvider
-from .gemini import GeminiProvider
-from .xai import XAIProvider
-from .claude import ClaudeProvider
-from .deepseek import DeepseekProvider
+from .cache import CachingProvider, cache_mode
+
+
+# Remote providers are given as (module, class) and imported on first use, so
+# a run only pays for the provider it actually talks to
+_PROVIDERS: Dict[str, Union[Type[Provider], Tuple[str, str]]] = {
+    "simple": SimpleProvider,
+    "mock": SimpleProvider,
+    "openai": (".openai", "OpenAIProvider"),
+    "gemini": (".gemini", "GeminiProvider"),
+    "xai": (".xai", "XAIProvider"),
+    "claude": (".claude", "ClaudeProvider"),
+    "deepseek": (".deepseek", "DeepseekProvider"),
+}
 
 
 def provider_from_name(name: str, api_key: str | None = None, system_prompt: str | None = None) -> Provider:
-    n = (name or "").lower()
-    if n in ("simple", "mock"):
-        return SimpleProvider(api_key, system_prompt)
-    if n == "openai":
-        return OpenAIProvider(api_key, system_prompt)
-    if n == "gemini":
-        return GeminiProvider(api_key, system_prompt)
-    if n == "xai":
-        return XAIProvider(api_key, system_prompt)
-    if n == "claude":
-        return ClaudeProvider(api_key, system_prompt)
-    if n == "deepseek":
-        return DeepseekProvider(api_key, system_prompt)
-    raise ValueError(f"Unknown provider: {name}")
+    # A per-request key (server runs) gets its own instance so the key is not
+    # kept alive past the run
+    if api_key is None:
+        provider = _shared_provider(name, system_prompt)
+    else:
+        provider = _make_provider(name, api_key, system_prompt)
+    mode = cache_mode()
+    if mode is not None:
+        # Opt-in reply cache shared by every run in the process (AGENT_ASYNC_CACHE)
+        provider = CachingProvider(provider, *mode)
+    return provider
+
+
+# Providers hold no per-call state, so one instance per (name, prompt) can
+# serve every keyless (env-configured) run in the process
+@lru_cache(maxsize=8)
+def _shared_provider(name: str, system_prompt: str | None) -> Provider:
+    return _make_provider(name, None, system_prompt)
+
+
+def _make_provider(name: str, api_key: str | None, system_prompt: str | None) -> Provider:
+    cls = _PROVIDERS.get((name or "").lower())
+    if cls is None:
+        raise ValueError(f"Unknown provider: {name}")
+    if isinstance(cls, tuple):
+        mod_name, cls_name = cls
+        cls = getattr(importlib.import_module(mod_name, __package__), cls_name)
+    return cls(api_key, system_prompt)
+
+
+async def list_all_models(providers: List[Provider]) -> Dict[str, List[str]]:
+    """Fetch model lists from several providers concurrently.
+
+    Each provider's API is independent, so total time is the slowest lookup
+    rather than the sum. A provider that fails maps to an empty list.
+    """
+    results = await asyncio.gather(*(p.list_models() for p in providers), return_exceptions=True)
+    return {p.name: (r if not isinstance(r, BaseException) else []) for p, r in zip(providers, results)}
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+try:  # optional: brotli-compressed responses
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Keep-alive connection pool shared by every provider. Requests run in worker
+# threads (asyncio.to_thread), so connections are checked out under a lock and
+# returned after the response body is read; a warm connection skips the TCP
+# and TLS handshakes entirely.
+_LIMIT_PER_HOST = 10
+_KEEPALIVE_TIMEOUT = 30.0
+_MAX_REDIRECTS = 5
+_REDIRECTS = (301, 302, 303, 307, 308)
+_CREDENTIAL_HEADERS = ("authorization", "x-api-key", "api-key", "cookie")
+_IDEMPOTENT = ("GET", "HEAD")
+
+_lock = threading.Lock()
+_idle: Dict[Tuple[str, str], List[Tuple[float, http.client.HTTPConnection]]] = {}
+_ssl_context: Optional[ssl.SSLContext] = None
+
+# Completions are large JSON bodies; ask for them compressed
+_ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+def _context() -> ssl.SSLContext:
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def _checkout(key: Tuple[str, str]) -> Optional[http.client.HTTPConnection]:
+    now = time.monotonic()
+    with _lock:
+        conns = _idle.get(key)
+        while conns:
+            ts, conn = conns.pop()
+            if now - ts < _KEEPALIVE_TIMEOUT:
+                return conn
+            conn.close()
+    return None
+
+
+def _checkin(key: Tuple[str, str], conn: http.client.HTTPConnection) -> None:
+    with _lock:
+        conns = _idle.setdefault(key, [])
+        if len(conns) < _LIMIT_PER_HOST:
+            conns.append((time.monotonic(), conn))
+            return
+    conn.close()
+
+
+def _uses_proxy(scheme: str, host: str) -> bool:
+    return scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(host)
+
+
+def _urllib_request(
+    method: str, url: str, headers: Dict[str, str], data: Optional[bytes], timeout: float
+) -> Tuple[int, Dict[str, str], bytes]:
+    req = urllib.request.Request(url, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, data=data, timeout=timeout) as resp:
+            return resp.status, dict(resp.getheaders()), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers or {}), e.read()
+
+
+def _decompress(headers: Dict[str, str], raw: bytes) -> bytes:
+    enc = next((v for k, v in headers.items() if k.lower() == "content-encoding"), "").strip().lower()
+    if not raw or enc in ("", "identity"):
+        return raw
+    if enc in ("gzip", "x-gzip"):
+        return gzip.decompress(raw)
+    if enc == "deflate":
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            # Some servers send a raw deflate stream without the zlib header
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+    if enc == "br" and brotli is not None:
+        return brotli.decompress(raw)
+    return raw
+
+
+def _open(
+    method: str, scheme: str, netloc: str, path: str, headers: Dict[str, str], data: Optional[bytes], timeout: float
+) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+    """Send a request on a pooled (or new) connection and return its response."""
+    key = (scheme, netloc)
+    while True:
+        conn = _checkout(key)
+        reused = conn is not None
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=timeout, context=_context())
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=timeout)
+        else:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+        try:
+            conn.request(method, path, body=data, headers=headers)
+        except ConnectionError:
+            conn.close()
+            # The server dropped an idle keep-alive connection before the
+            # request went out; retry on a fresh one
+            if reused:
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        try:
+            return conn, conn.getresponse()
+        except (ConnectionError, http.client.BadStatusLine):
+            conn.close()
+            # The request was sent, so only an idempotent one may be repeated;
+            # a POST (a billed completion) surfaces to the caller instead
+            if reused and method in _IDEMPOTENT:
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            raise
+
+
+def _release(scheme: str, netloc: str, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+    if resp.will_close:
+        conn.close()
+    else:
+        _checkin((scheme, netloc), conn)
+
+
+def _pooled(url: str) -> Optional[Tuple[str, str, str]]:
+    """(scheme, netloc, path) for URLs the pool handles; None for urllib."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or _uses_proxy(scheme, parts.hostname or ""):
+        return None
+    return scheme, parts.netloc, (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+
+def request(
+    method: str, url: str, headers: Dict[str, str], data: Optional[bytes] = None, timeout: float = 30
+) -> Tuple[int, Dict[str, str], bytes]:
+    """Send one request over a pooled connection; return (status, headers, body).
+
+    HTTP error statuses are returned, not raised; redirects are followed (a
+    3xx comes back only past _MAX_REDIRECTS or without a Location). Proxied
+    and non-HTTP(S) URLs go through urllib unchanged. Compressed bodies are
+    decoded.
+    """
+    if not any(k.lower() == "accept-encoding" for k in headers):
+        headers = {**headers, "Accept-Encoding": _ACCEPT_ENCODING}
+    target = _pooled(url)
+    if target is None:
+        status, resp_headers, raw = _urllib_request(method, url, headers, data, timeout)
+        return status, resp_headers, _decompress(resp_headers, raw)
+    for _ in range(_MAX_REDIRECTS + 1):
+        scheme, netloc, path = target
+        conn, resp = _open(method, scheme, netloc, path, headers, data, timeout)
+        try:
+            raw = resp.read()
+        except BaseException:
+            conn.close()
+            raise
+        _release(scheme, netloc, conn, resp)
+        resp_headers = dict(resp.getheaders())
+        location = resp.getheader("Location")
+        if resp.status not in _REDIRECTS or not location:
+            break
+        # Follow like urllib: 307/308 repeat the request, 301/302/303 turn
+        # anything but GET/HEAD into a bodiless GET
+        url = urljoin(url, location)
+        if resp.status in (301, 302, 303) and method not in ("GET", "HEAD"):
+            method, data = "GET", None
+            headers = {k: v for k, v in headers.items() if not k.lower().startswith("content-")}
+        nxt = _pooled(url)
+        if nxt is None or nxt[:2] != (scheme, netloc):
+            # Never forward credentials to a different origin
+            headers = {k: v for k, v in headers.items() if k.lower() not in _CREDENTIAL_HEADERS}
+        if nxt is None:
+            status, resp_headers, raw = _urllib_request(method, url, headers, data, timeout)
+            return status, resp_headers, _decompress(resp_headers, raw)
+        target = nxt
+    return resp.status, resp_headers, _decompress(resp_headers, raw)
+
+
+def close_session() -> None:
+    """Close every idle pooled connection (call on shutdown)."""
+    with _lock:
+        conns = [c for lst in _idle.values() for _, c in lst]
+        _idle.clear()
+    for conn in conns:
+        conn.close()
@@ -1,13 +1,37 @@
 from __future__ import annotations
 
 import asyncio
+import http.client
 import json
 import os
 import sys
-import urllib.request
 import urllib.error
 from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
+
+from . import http_session
+
+try:  # optional: faster encoding/decoding of large bodies (long transcripts, long replies)
+    import orjson
+
+    def _body_bytes(body: dict) -> bytes:
+        try:
+            return orjson.dumps(body)
+        except TypeError:
+            return json.dumps(body).encode("utf-8")
+
+    def _loads(raw: bytes) -> Any:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Invalid UTF-8, NaN, big ints: let the lenient stdlib path decide
+            return json.loads(raw.decode("utf-8", errors="replace"))
+except ImportError:
+    def _body_bytes(body: dict) -> bytes:
+        return json.dumps(body).encode("utf-8")
+
+    def _loads(raw: bytes) -> Any:
+        return json.loads(raw.decode("utf-8", errors="replace"))
 
 
 def _redact_url(url: str) -> str:
@@ -25,6 +49,10 @@ def _redact_url(url: str) -> str:
         return url
 
 
+def _http_error(url: str, status: int, headers: Dict[str, str]) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError(url, status, http.client.responses.get(status, ""), headers, None)
+
+
 def _redact_headers(headers: Dict[str, str]) -> Dict[str, str]:
     out = {}
     for k, v in headers.items():
@@ -45,32 +73,28 @@ def _do_http_get(url: str, headers: Optional[Dict[str, str]] = None, timeout: in
     }
     if headers:
         base_headers.update(headers)
-    req = urllib.request.Request(url, headers=base_headers, method="GET")
     debug_flag = debug or bool(os.environ.get("AGENT_ASYNC_DEBUG_HTTP"))
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            status = getattr(resp, "status", None)
-            resp_headers = dict(resp.getheaders())
-            raw = resp.read()
-            text = raw.decode("utf-8", errors="replace")
+        status, resp_headers, raw = http_session.request("GET", url, base_headers, None, timeout)
+        if status < 300:
             if debug_flag:
+                text = raw.decode("utf-8", errors="replace")
                 print(
                     f"HTTP GET {_redact_url(url)} -> {status}\nHeaders: {_redact_headers(resp_headers)}\nBody: {text[:2000]}",
                     file=sys.stderr,
                 )
-            return json.loads(text)
-    except urllib.error.HTTPError as e:
+            return _loads(raw)
+        if status < 400:
+            # A redirect that was not followed; its body is not the API's JSON
+            raise _http_error(url, status, resp_headers)
+        text = raw.decode("utf-8", errors="replace")
         # Try to parse error body as JSON
+        if debug_flag:
+            print(f"HTTP GET {_redact_url(url)} HTTPError {status}: {text[:2000]}", file=sys.stderr)
         try:
-            raw = e.read() if hasattr(e, "read") else b""
-            text = raw.decode("utf-8", errors="replace")
-            if debug_flag:
-                print(f"HTTP GET {_redact_url(url)} HTTPError {e.code}: {text[:2000]}", file=sys.stderr)
             return json.loads(text)
         except Exception:
-            if debug_flag:
-                print(f"HTTP GET {_redact_url(url)} failed: {e}", file=sys.stderr)
-            raise
+            raise _http_error(url, status, resp_headers) from None
     except Exception as e:
         if debug_flag:
             print(f"HTTP GET {_redact_url(url)} failed: {e}", file=sys.stderr)
@@ -105,16 +129,13 @@ def _do_http_post(url: str, body: dict, headers: Optional[Dict[str, str]] = None
     }
     if headers:
         base_headers.update(headers)
-    data = json.dumps(body).encode("utf-8")
-    req = urllib.request.Request(url, headers=base_headers, method="POST")
+    data = _body_bytes(body)
     debug_flag = debug or bool(os.environ.get("AGENT_ASYNC_DEBUG_HTTP"))
     try:
-        with urllib.request.urlopen(req, data=data, timeout=timeout) as resp:
-            status = getattr(resp, "status", None)
-            resp_headers = dict(resp.getheaders())
-            raw = resp.read()
-            text = raw.decode("utf-8", errors="replace")
+        status, resp_headers, raw = http_session.request("POST", url, base_headers, data, timeout)
+        if status < 300:
             if debug_flag:
+                text = raw.decode("utf-8", errors="replace")
                 max_len = 2000
                 try:
                     if os.environ.get("AGENT_ASYNC_DEBUG_HTTP_BODY") in ("1", "true", "yes"):
@@ -125,33 +146,29 @@ def _do_http_post(url: str, body: dict, headers: Optional[Dict[str, str]] = None
                     f"HTTP POST {_redact_url(url)} -> {status}\nHeaders: {_redact_headers(resp_headers)}\nBody: {text[:max_len]}",
                     file=sys.stderr,
                 )
-            return json.loads(text)
-    except urllib.error.HTTPError as e:
+            return _loads(raw)
+        if status < 400:
+            # A redirect that was not followed; its body is not the API's JSON
+            raise _http_error(url, status, resp_headers)
+        text = raw.decode("utf-8", errors="replace")
         # Try to parse error body as JSON for structured error data
+        if debug_flag:
+            max_len = 2000
+            payload_len = 1000
+            try:
+                if os.environ.get("AGENT_ASYNC_DEBUG_HTTP_BODY") in ("1", "true", "yes"):
+                    max_len = len(text)
+                    payload_len = len(json.dumps(body))
+            except Exception:
+                pass
+            print(
+                f"HTTP POST {_redact_url(url)} HTTPError {status}: {text[:max_len]}\nPayload: {json.dumps(body)[:payload_len]}",
+                file=sys.stderr,
+            )
         try:
-            raw = e.read() if hasattr(e, "read") else b""
-            text = raw.decode("utf-8", errors="replace")
-            if debug_flag:
-                max_len = 2000
-                payload_len = 1000
-                try:
-                    if os.environ.get("AGENT_ASYNC_DEBUG_HTTP_BODY") in ("1", "true", "yes"):
-                        max_len = len(text)
-                        payload_len = len(json.dumps(body))
-                except Exception:
-                    pass
-                print(
-                    f"HTTP POST {_redact_url(url)} HTTPError {e.code}: {text[:max_len]}\nPayload: {json.dumps(body)[:payload_len]}",
-                    file=sys.stderr,
-                )
             return json.loads(text)
         except Exception:
-            if debug_flag:
-                print(
-                    f"HTTP POST {_redact_url(url)} failed: {e}\nPayload: {json.dumps(body)[:1000]}",
-                    file=sys.stderr,
-                )
-            raise
+            raise _http_error(url, status, resp_headers) from None
     except Exception as e:
         if debug_flag:
             payload_len = 1000
@@ -3,6 +3,8 @@ from __future__ import annotations
 import os
 from typing import List
 
+from ..agent.prompt import AGENT_JSON_PROMPT
+from . import cache
 from .base import Message, Provider
 from .util_http import http_get_json, http_post_json
 
@@ -15,27 +17,7 @@ class XAIProvider(Provider):
         super().__init__(key.strip() if key else None, system_prompt)
 
     def _get_default_system_prompt(self) -> str:
-        return (
-            "You are an autonomous AI coding agent. Your goal is to complete the task by executing shell commands.\n\n"
-            "**RESPONSE FORMAT**\n"
-            "- Respond with EXACTLY one JSON object and nothing else.\n"
-            '- The JSON object must have this schema:\n'
-            '  {"type": "run" | "message" | "done", "cmd?": string, "message?": string, "thought": string}\n\n'
-            "**RULES**\n"
-            "1.  **JSON Only:** Your entire response must be a single, valid JSON object. No markdown, no commentary, no text outside the JSON.\n"
-            "2.  File edits: Prefer minimal in-place edits to save tokens. Use full-file here-doc only when necessary.\n"
-            "    - Preferred (portable): Python to read/modify/write a file (use replace/regex/insert).\n"
-            "      If available, you may call the helper: python3 ../../agent_async/scripts/edit.py replace|regex|insert_after|ensure_block ...\n"
-            "    - Full rewrite (when needed):\n"
-            "      cat > path/to/file <<EOF\\n...content...\\nEOF\n"
-            "3.  **Output Truncation:** Only the last 200 lines of each command's combined stdout/stderr are provided back to you in the conversation context. Prefer commands that focus output (tail/grep/rg).\n"
-            "4.  **File Reading:** Use head -n 100 <file> or grep <pattern> <file>. Avoid cat on large files.\n"
-            "5.  **No Human:** You have no human to ask for help. Discover information via commands.\n"
-            "6.  **Finish:** When the task is complete, reply with {\"type\":\"done\", \"message\":\"I have completed the task.\"}."
-            "\n\n**Safety and cleanliness**\n"
-            "- Before finishing, ensure no compiled binaries or build artifacts remain in the working tree or staged for commit. Remove typical artifacts (e.g., __pycache__/, *.pyc, dist/, build/, node_modules/, *.o, *.so, *.dll, *.exe, target/, *.class) or add appropriate .gitignore entries and run a safe cleanup (e.g., `git clean -fdX` after confirming ignores). Do not include built artifacts in any commits or PRs.\n"
-            "- Cleanup step: Always run a cleanup command before replying with type 'done'. Prefer `git clean -fdX` to remove ignored build outputs. If artifacts aren't ignored, explicitly delete common build directories/files (e.g., `rm -rf -- dist build target out .venv .tox .pytest_cache node_modules */bin */obj *.o *.so *.dll *.exe *.class __pycache__`)."
-        ).strip()
+        return AGENT_JSON_PROMPT
 
     async def complete(self, model: str, messages: List[Message]) -> str:
         if not self.api_key:
@@ -157,6 +139,9 @@ class XAIProvider(Provider):
         if not self.api_key:
             # Provide a hint list
             return ["grok-2-latest", "grok-2-mini", "grok-beta"]
+        cached = cache.get_models(self.name, self.api_key)
+        if cached is not None:
+            return cached
         try:
             url = "https://api.x.ai/v1/models"
             headers = {
@@ -179,6 +164,7 @@ class XAIProvider(Provider):
                     seen.add(m)
                     out.append(m)
             if out:
+                cache.put_models(self.name, self.api_key, out)
                 return out
         except Exception:
             pass
@@ -20,7 +20,8 @@ import shutil
 from agent_async.core.run_registry import RunRegistry
 from agent_async.core.events import EventBus
 from agent_async.exec.local import LocalExecutor
-from agent_async.providers.factory import provider_from_name
+from agent_async.providers.factory import list_all_models, provider_from_name
+from agent_async.providers.http_session import close_session
 from agent_async.agent.loop import AgentRunner
 from agent_async.core.repo_store import RepoStore
 
@@ -39,6 +40,7 @@ class RunManager:
         self._threads: Dict[str, threading.Thread] = {}
         self._api_keys: Dict[str, Optional[str]] = {}
         self._cancels: Dict[str, threading.Event] = {}
+        self._runners: Dict[str, AgentRunner] = {}
 
     def start(self, repo_path: Path, provider_name: str, model: Optional[str], task: str, api_key: Optional[str] = None, repo_url: Optional[str] = None, truncate_limit: Optional[int] = None) -> str:
         run = self.registry.create_run(repo_path, provider_name, model, task, repo_url=repo_url, truncate_limit=truncate_limit)
@@ -50,6 +52,17 @@ class RunManager:
         self._threads[run.id] = t
         return run.id
 
+    def cancel(self, run_id: str) -> None:
+        evt = self._cancels.get(run_id)
+        if not evt:
+            # Lazily create a cancel event for older runs
+            evt = self._cancels[run_id] = threading.Event()
+        evt.set()
+        # Wake a live runner right away instead of waiting for its next poll
+        runner = self._runners.get(run_id)
+        if runner:
+            runner.cancel()
+
     def _worker(self, run_id: str) -> None:
         run = self.registry.get(run_id)
         event_bus = EventBus(run.events_path)
@@ -101,19 +114,27 @@ class RunManager:
                 evt = self._cancels.get(run.id)
                 return bool(evt and evt.is_set())
             runner = AgentRunner(event_bus=event_bus, provider=provider, executor=executor, truncate_limit=run.truncate_limit, cancel_check=cancel_check)
-            await runner.run(run_id=run.id, task=run.task, model=run.model)
+            self._runners[run.id] = runner
+            try:
+                await runner.run(run_id=run.id, task=run.task, model=run.model)
+            finally:
+                self._runners.pop(run.id, None)
 
         try:
             asyncio.run(_run())
         except asyncio.CancelledError:
             # Graceful cancel: mark as done
             try:
-                EventBus(run.events_path).emit("agent.message", {"role": "info", "content": "Run cancelled."})
-                EventBus(run.events_path).emit("agent.done", {})
+                event_bus.emit_batch((
+                    ("agent.message", {"role": "info", "content": "Run cancelled."}),
+                    ("agent.done", {}),
+                ))
             except Exception:
                 pass
         except Exception as e:
             event_bus.emit("agent.error", {"error": str(e)})
+        finally:
+            event_bus.close()
 
 
 MANAGER = RunManager(RUNS_DIR)
@@ -415,6 +436,13 @@ class Handler(BaseHTTPRequestHandler):
             prev_debug = os.environ.get("AGENT_ASYNC_DEBUG_HTTP")
             if debug_q in ("1", "true", "yes"):
                 os.environ["AGENT_ASYNC_DEBUG_HTTP"] = "1"
+            if provider == "all":
+                # Every provider at once, using keys from the environment
+                provs = [provider_from_name(name) for name in fallback_map]
+                found = asyncio.run(list_all_models(provs))
+                return _json_response(
+                    self, HTTPStatus.OK, {"models": {name: found.get(name) or fallback for name, fallback in fallback_map.items()}}
+                )
             prov = provider_from_name(provider, api_key=api_key)
             models = asyncio.run(prov.list_models())
             if not models:
@@ -448,7 +476,11 @@ class Handler(BaseHTTPRequestHandler):
         try:
             reg = RunRegistry(base_dir=RUNS_DIR)
             run = reg.get(run_id)
-            EventBus(run.events_path).emit("agent.message", {"role": "info", "content": f"PR requested: branch='{branch or '(auto)'}' title='{title or '(auto)'}'"})
+            eb = EventBus(run.events_path)
+            try:
+                eb.emit("agent.message", {"role": "info", "content": f"PR requested: branch='{branch or '(auto)'}' title='{title or '(auto)'}'"})
+            finally:
+                eb.close()
         except Exception:
             pass
 
@@ -462,16 +494,14 @@ class Handler(BaseHTTPRequestHandler):
         if not run_id:
             return self.send_error(HTTPStatus.NOT_FOUND)
         try:
-            evt = MANAGER._cancels.get(run_id)
-            if not evt:
-                # Lazily create a cancel event for older runs
-                MANAGER._cancels[run_id] = threading.Event()
-                evt = MANAGER._cancels[run_id]
-            evt.set()
+            MANAGER.cancel(run_id)
             run = MANAGER.registry.get(run_id)
             eb = EventBus(run.events_path)
-            eb.emit("agent.message", {"role": "info", "content": "Cancellation requested by user."})
-            eb.emit("agent.done", {})
+            eb.emit_batch((
+                ("agent.message", {"role": "info", "content": "Cancellation requested by user."}),
+                ("agent.done", {}),
+            ))
+            eb.close()
             return _json_response(self, HTTPStatus.OK, {"ok": True})
         except Exception as e:
             return _json_response(self, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
@@ -485,11 +515,7 @@ class Handler(BaseHTTPRequestHandler):
         skip_reason = None
         try:
             # Cancel if running
-            evt = MANAGER._cancels.get(run_id)
-            if not evt:
-                MANAGER._cancels[run_id] = threading.Event()
-                evt = MANAGER._cancels[run_id]
-            evt.set()
+            MANAGER.cancel(run_id)
 
             run = MANAGER.registry.get(run_id)
 
@@ -663,6 +689,8 @@ def _create_pr_worker(run_id: str, branch: str, title: str, pr_body: str) -> Non
         asyncio.run(_run())
     except Exception as e:
         event_bus.emit("agent.error", {"error": str(e)})
+    finally:
+        event_bus.close()
 
 
 def serve(host: str = "127.0.0.1", port: int = 8765):
@@ -674,6 +702,7 @@ def serve(host: str = "127.0.0.1", port: int = 8765):
         pass
     finally:
         httpd.server_close()
+        close_session()
 
 
 def main(argv=None) -> int:
@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from agent_async.cli import _load_batch_specs
+
+
+class LoadBatchSpecsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.repo = self.dir / "repo"
+        self.repo.mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self, text):
+        path = self.dir / "tasks.jsonl"
+        path.write_text(text)
+        return str(path), lambda: _load_batch_specs(str(path), str(self.repo), "m0")
+
+    def test_strings_and_objects(self):
+        _, load = self.load('"first"\n\n{"task": "second", "model": "m1"}\n')
+        specs = load()
+        self.assertEqual([s["task"] for s in specs], ["first", "second"])
+        self.assertEqual([s["model"] for s in specs], ["m0", "m1"])
+        self.assertEqual(specs[0]["repo"], self.repo.resolve())
+
+    def test_errors_name_file_and_line(self):
+        cases = {
+            '"ok"\n{not json\n': ":2: invalid JSON",
+            '"ok"\n[1, 2]\n': ":2: expected a task string or an object, got list",
+            '"ok"\n"ok"\n7\n': ":3: expected a task string or an object, got int",
+            '{"model": "m"}\n': ':1: "task" must be a non-empty string',
+            '{"task": "t", "repo": 3}\n': ':1: "repo" must be a string',
+            '{"task": "t", "repo": "/nonexistent/x"}\n': ":1: repo path not found",
+        }
+        for text, expected in cases.items():
+            path, load = self.load(text)
+            with self.assertRaises(SystemExit) as cm:
+                load()
+            self.assertIn(path + expected, str(cm.exception.code))
+
+
+if __name__ == "__main__":
+    unittest.main()
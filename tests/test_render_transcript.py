@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from agent_async.agent.loop import AgentRunner, _CLIP_MARKER, _NEWEST_MIN_CHARS
+from agent_async.core.events import EventBus
+from agent_async.exec.local import LocalExecutor
+from agent_async.providers.base import SimpleProvider
+
+
+class RenderTranscriptTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bus = EventBus(Path(self.tmp.name) / "events.jsonl")
+        self.runner = AgentRunner(self.bus, SimpleProvider(), LocalExecutor(self.tmp.name))
+
+    def tearDown(self):
+        self.bus.close()
+        self.tmp.cleanup()
+
+    def render(self, transcript, ctx_max, per_msg_max):
+        self.runner._transcript_chars = self.runner._estimate_len(transcript)
+        return self.runner._render_transcript(transcript, ctx_max, per_msg_max)
+
+    def test_newest_message_survives_oversized_system_prompt(self):
+        task = "do the thing " * 1000
+        transcript = [{"role": "system", "content": "s" * 20_000}, {"role": "user", "content": task}]
+        view, trimmed = self.render(transcript, ctx_max=10_000, per_msg_max=0)
+        self.assertTrue(trimmed)
+        self.assertEqual(view[0], transcript[0])
+        self.assertEqual(len(view[-1]["content"]), _NEWEST_MIN_CHARS)
+        self.assertTrue(view[-1]["content"].endswith(task[-100:]))
+
+    def test_newest_message_clipped_once(self):
+        task = "x" * 50_000
+        transcript = [{"role": "system", "content": "s" * 100}, {"role": "user", "content": task}]
+        view, trimmed = self.render(transcript, ctx_max=8_000, per_msg_max=20_000)
+        self.assertTrue(trimmed)
+        content = view[-1]["content"]
+        self.assertEqual(content.count(_CLIP_MARKER), 1)
+        self.assertLessEqual(len(content), 8_000)
+
+    def test_fits_unclipped(self):
+        transcript = [{"role": "system", "content": "s"}, {"role": "user", "content": "hi"}]
+        view, trimmed = self.render(transcript, ctx_max=10_000, per_msg_max=5_000)
+        self.assertIs(view, transcript)
+        self.assertFalse(trimmed)
+
+
+if __name__ == "__main__":
+    unittest.main()